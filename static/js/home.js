@@ -0,0 +1,48 @@
+// Initialize carousel with 10-second interval
+var carousel = new bootstrap.Carousel(document.getElementById('heroCarousel'), {
+  interval: 10000
+})
+
+document.addEventListener('DOMContentLoaded', function () {
+  // Function to animate counting
+  function animateCounter(element, target, prefix = '') {
+    let current = 0
+    const duration = 2000 // 2 seconds
+    const steps = 60
+    const increment = target / steps
+
+    const interval = setInterval(() => {
+      current += increment
+      if (current >= target) {
+        current = target
+        clearInterval(interval)
+      }
+      element.textContent = prefix + Math.floor(current).toLocaleString()
+    }, duration / steps)
+  }
+
+  // Create an Intersection Observer to trigger animations when elements come into view
+  const observer = new IntersectionObserver(
+    (entries) => {
+      entries.forEach((entry) => {
+        if (entry.isIntersecting) {
+          const element = entry.target
+          if (element.classList.contains('counter')) {
+            if (element.classList.contains('currency')) {
+              animateCounter(element, parseInt(element.dataset.amount), 'UGX ')
+            } else {
+              animateCounter(element, parseInt(element.dataset.count))
+            }
+            observer.unobserve(element) // Stop observing once animated
+          }
+        }
+      })
+    },
+    { threshold: 0.5 }
+  ) // Trigger when 50% of the element is visible
+
+  // Observe all counter elements
+  document.querySelectorAll('.counter').forEach((element) => {
+    observer.observe(element)
+  })
+})
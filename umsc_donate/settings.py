@@ -13,9 +13,13 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 import os 
 
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
@@ -43,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the rest of the middleware is measured too
+    'web.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +62,8 @@ ROOT_URLCONF = 'umsc_donate.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, timing renders for RequestMetricsMiddleware
+        'BACKEND': 'web.instrumentation.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -66,6 +73,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'web.context_processors.zakah_nisab',
+                'web.context_processors.cache_versions',
             ],
         },
     },
@@ -77,13 +85,144 @@ WSGI_APPLICATION = 'umsc_donate.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# Settings for the database profiles below come from the environment or a
+# .env file next to manage.py. DATABASE_ENGINE picks the profile: sqlite
+# (default) or postgresql.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+# Alias the statistics, dashboard, contribution list and export views read the
+# web app's tables from (see web.routers); empty keeps them on default. On by
+# default when a PostgreSQL replica is configured.
+READ_REPLICA = os.environ.get('READ_REPLICA', '')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'umsc_donate'),
+            'USER': os.environ.get('POSTGRES_USER', 'umsc_donate'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Each worker thread keeps its connection between requests; put
+            # PgBouncer in front once they outnumber max_connections
+            'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            # PgBouncer in transaction pooling mode can't keep the server-side
+            # cursor QuerySet.iterator() (the CSV export) uses across transactions
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('POSTGRES_PGBOUNCER') == '1',
+        },
+    }
+    if os.environ.get('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+            'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+        READ_REPLICA = os.environ.get('READ_REPLICA', 'replica')
+else:
+    # Run on every new SQLite connection. WAL lets reads carry on while a
+    # donation commits, and with WAL synchronous=NORMAL only risks the last
+    # commits on a power loss, never corruption. Writers wait up to
+    # busy_timeout ms for the lock; mmap_size (bytes) and cache_size
+    # (negative: KiB) keep more of the file in memory.
+    SQLITE_PRAGMAS = [
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))}",
+        f"PRAGMA cache_size={int(os.environ.get('SQLITE_CACHE_SIZE', -20000))}",
+    ]
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'web.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'init_command': ';'.join(['PRAGMA journal_mode=WAL', *SQLITE_PRAGMAS]),
+                # Take the write lock at BEGIN, while busy_timeout still applies
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # Reuse a connection (and its pragmas and page cache) across requests
+            'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            # A file-backed test database lets the concurrency tests use real
+            # SQLite locking instead of shared-cache in-memory table locks.
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        },
+    }
+    # Stands in for a replica locally (READ_REPLICA=replica) and in tests: a
+    # second, read-only connection to the same file
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'OPTIONS': {'init_command': ';'.join([*SQLITE_PRAGMAS, 'PRAGMA query_only=ON'])},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['web.routers.ReadReplicaRouter']
+
+# Cache
+# Use a shared backend (Redis or Memcached) in production so every worker
+# sees invalidations such as a new Zakah nisab immediately.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Number of rows each ContributionCounter type is spread across
+CONTRIBUTION_COUNTER_SHARDS = 8
+
+
+# Request metrics
+# Most queries one request to each view may run, with cold caches and a logged-in
+# user. Going over logs a warning, or fails the request when
+# QUERY_BUDGETS_ENFORCE is on, as it is in the test suite.
+
+QUERY_BUDGETS = {
+    'web:home': 4,
+    # Receipt allocation, rollup and counter upserts, savepoints included
+    'web:pay_zakah': 20,
+    'web:pay_sadaqa': 20,
+    'web:pay_projects': 20,
+    'web:receipt': 4,
+    'web:gallery': 5,
+    'web:dashboard': 9,
+    'web:contribution_export': 3,
+    'web:contribution_list': 3,
+    'web:overall_contributions': 8,
+    'web:district_contributions': 6,
+    'web:projects': 5,
+    'web:activities': 6,
+    # None with the bearer token; the session and user for staff
+    'web:metrics': 2,
+}
+
+QUERY_BUDGETS_ENFORCE = False
+
+# Bearer token a scraper sends to read /metrics; staff users can read it
+# while logged in. Empty means staff only.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One line per request with its queries and timings
+        'web.metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('WEB_METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -125,6 +264,17 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# collectstatic minifies CSS, adds a content hash to every file name and
+# writes .gz/.br copies; umsc_donate/wsgi.py serves them with far-future caching
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'web.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'umsc_donate.settings')
 
 application = get_wsgi_application()
+
+# Imported once Django is set up; serves collected static files ahead of Django
+from web.static import CompressedStaticFiles  # noqa: E402
+
+application = CompressedStaticFiles(application)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Contribution, Gallery, ContributionCounter, Activity, Project, ZakahNisab, District
+from .exports import contributions_csv_response
+from .models import Contribution, Gallery, ContributionCounter, Activity, Project, ZakahNisab, ZakahNisabPeriod, District, ReceiptSequence, ContributionRollup
 
 @admin.register(Contribution)
 class ContributionAdmin(admin.ModelAdmin):
@@ -8,6 +9,11 @@ class ContributionAdmin(admin.ModelAdmin):
     search_fields = ('first_name', 'last_name', 'phone_number', 'receipt_number')
     readonly_fields = ('receipt_number', 'date_contributed')
     ordering = ('-date_contributed',)
+    actions = ['export_csv']
+
+    @admin.action(description='Export selected contributions as CSV')
+    def export_csv(self, request, queryset):
+        return contributions_csv_response(queryset)
 
 @admin.register(Gallery)
 class GalleryAdmin(admin.ModelAdmin):
@@ -21,8 +27,23 @@ class DistrictAdmin(admin.ModelAdmin):
 
 @admin.register(ContributionCounter)
 class ContributionCounterAdmin(admin.ModelAdmin):
-    list_display = ('contribution_type', 'count', 'total_amount')
-    readonly_fields = ('count', 'total_amount')
+    list_display = ('contribution_type', 'shard', 'count', 'total_amount')
+    list_filter = ('contribution_type',)
+    readonly_fields = ('shard', 'count', 'total_amount')
+
+@admin.register(ContributionRollup)
+class ContributionRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'contribution_type', 'district', 'project', 'count', 'total_amount')
+    list_filter = ('contribution_type', 'district')
+    readonly_fields = ('date', 'contribution_type', 'district', 'project', 'count', 'total_amount')
+    ordering = ('-date',)
+
+@admin.register(ReceiptSequence)
+class ReceiptSequenceAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'date', 'last_number')
+    list_filter = ('prefix',)
+    readonly_fields = ('prefix', 'date', 'last_number')
+    ordering = ('-date', 'prefix')
 
 @admin.register(Activity)
 class ActivityAdmin(admin.ModelAdmin):
@@ -39,9 +60,40 @@ class ProjectAdmin(admin.ModelAdmin):
     readonly_fields = ('current_amount', 'progress_percentage', 'supporter_count')
     ordering = ('-created_at',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_stats()
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # current_amount is maintained by contributions; never write back the copy loaded with the form
+            obj.save(update_fields=[*form.changed_data, 'updated_at'])
+        else:
+            obj.save()
+
+    @admin.display(description='Progress percentage', ordering='annotated_progress_percentage')
+    def progress_percentage(self, obj):
+        return obj.progress_percentage
+
+    @admin.display(description='Supporter count', ordering='annotated_supporter_count')
+    def supporter_count(self, obj):
+        return obj.supporter_count
+
+class ZakahNisabPeriodInline(admin.TabularInline):
+    # History is written by ZakahNisab.save(), never edited by hand
+    model = ZakahNisabPeriod
+    fields = ('effective_from', 'amount', 'currency')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    ordering = ('-effective_from', '-id')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(ZakahNisab)
 class ZakahNisabAdmin(admin.ModelAdmin):
     list_display = ('amount', 'currency', 'last_updated', 'is_active')
     readonly_fields = ('last_updated',)
+    inlines = [ZakahNisabPeriodInline]
     list_filter = ('is_active', 'currency')
     ordering = ('-last_updated',)
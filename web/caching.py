@@ -0,0 +1,204 @@
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date, urlencode
+
+from .models import District, Project, ZakahNisab
+
+# Cached data is grouped by what it is derived from. Each group has a version
+# token in the shared cache that is part of every key built from it; replacing
+# the token (see bump_version) makes all of those entries unreachable at once.
+VERSION_KEY = 'cache_version:%s'
+
+# How long a worker may hold the rebuild lock for an expired entry, and how
+# long other workers keep serving the expired value while it does.
+REBUILD_LOCK_TIMEOUT = 30
+STALE_GRACE = 60
+
+
+def get_version(group):
+    key = VERSION_KEY % group
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*groups):
+    # Wait for the commit so no worker re-caches the old rows under the new version
+    def bump():
+        cache.set_many({VERSION_KEY % group: uuid.uuid4().hex for group in groups}, None)
+    transaction.on_commit(bump)
+
+
+class CacheVersions:
+    """Template-friendly lookup of group versions, e.g. {% cache 600 counters cache_versions.contributions %}."""
+
+    def __getitem__(self, group):
+        return get_version(group)
+
+
+def get_or_build(key, build, timeout):
+    """
+    Return the cached value for `key`, calling `build()` to refresh it when it expires.
+
+    Only one worker rebuilds an expired entry; the others keep serving the old
+    value for up to STALE_GRACE seconds, or wait for the rebuild when there is
+    nothing to serve. A `build()` result of None is returned but not cached.
+    """
+    entry = cache.get(key)
+    if entry and entry[1] > time.time():
+        return entry[0]
+
+    lock_key = f'{key}:rebuild'
+    if cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+        try:
+            value = build()
+            if value is not None:
+                cache.set(key, (value, time.time() + timeout), timeout + STALE_GRACE)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    if entry:
+        return entry[0]
+    deadline = time.time() + REBUILD_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry:
+            return entry[0]
+    return build()
+
+
+class CachedPageMixin:
+    """
+    Cache the rendered page for anonymous GET requests, keyed by path, the
+    `cache_query_params` the view reads and the versions of `cache_groups`.
+    """
+
+    cache_groups = ()
+    cache_query_params = ()
+    cache_timeout = 60 * 10
+
+    def page_cache_key(self, request):
+        versions = ':'.join(get_version(group) for group in self.cache_groups)
+        params = urlencode(sorted((name, request.GET[name]) for name in self.cache_query_params if name in request.GET))
+        url = hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+        return f'page:{request.resolver_match.view_name}:{url}:{versions}'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        # Parameters the view ignores (tracking tags, cache busters) would
+        # each get a copy of the same page; render those without the cache
+        if not set(request.GET) <= set(self.cache_query_params):
+            return super().dispatch(request, *args, **kwargs)
+
+        rendered = {}
+
+        def build():
+            response = super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            rendered['response'] = response
+            if response.status_code != 200:
+                return None
+            return {'content': response.content, 'content_type': response['Content-Type']}
+
+        page = get_or_build(self.page_cache_key(request), build, self.cache_timeout)
+        if page is None:
+            return rendered['response']
+        return HttpResponse(page['content'], content_type=page['content_type'])
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET requests whose If-None-Match/If-Modified-Since still match with
+    304 Not Modified before the view does any aggregation or rendering.
+
+    Views implement get_validator_data(), returning a tuple of cheap values that
+    change whenever the page would (typically one aggregate query) and the
+    page's last-modified datetime or None. The result is cached under the
+    versions of the view's cache_groups, like the page itself, so a warm
+    validator costs no queries and goes stale exactly when the page does.
+    """
+
+    cache_groups = ()
+    cache_timeout = 60 * 10
+
+    def get_validator_data(self):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        versions = [get_version(group) for group in self.cache_groups]
+        key = f'validator:{request.resolver_match.view_name}:{":".join(versions)}'
+        values, last_modified = get_or_build(key, self.get_validator_data, self.cache_timeout)
+        # The rendered page differs for logged-in users
+        fingerprint = repr((values, versions, request.get_full_path(), request.user.is_authenticated))
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if last_modified:
+                    response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+# Versions invalidate the choice lists; the timeout only bounds how long an unused list lingers
+CHOICES_TIMEOUT = 60 * 60
+
+
+def get_district_choices():
+    """(pk, name) for every district, for the donation form's select."""
+    key = f'choices:districts:{get_version("districts")}'
+    return get_or_build(key, lambda: list(District.objects.values_list('pk', 'name')), CHOICES_TIMEOUT)
+
+
+def get_project_choices():
+    """(pk, title) for every active project."""
+    # Versioned apart from 'projects', which every donation bumps through the
+    # funding progress; the titles only change when a project is saved
+    key = f'choices:projects:{get_version("project_choices")}'
+    return get_or_build(
+        key, lambda: list(Project.objects.filter(is_active=True).values_list('pk', 'title')), CHOICES_TIMEOUT,
+    )
+
+
+NISAB_VALUE_KEY = 'zakah_nisab:active:%s'
+
+# Process-local copy of the active nisab, tagged with the shared-cache version
+# it was read under. A version change made by any worker makes it stale.
+_local_nisab = {'version': None, 'value': None}
+
+
+def get_active_nisab():
+    """Return the active ZakahNisab (or None) without touching the database on the normal path."""
+    version = get_version('nisab')
+    if _local_nisab['version'] == version:
+        return _local_nisab['value']
+
+    key = NISAB_VALUE_KEY % version
+    cached = cache.get(key)
+    if cached is None:
+        # Wrapped in a tuple so "no active nisab" is cached too
+        # Unordered, so the partial unique index on the active row is used;
+        # there is at most one such row
+        active = list(ZakahNisab.objects.filter(is_active=True)[:1])
+        cached = (active[0] if active else None,)
+        cache.set(key, cached, None)
+    _local_nisab.update(version=version, value=cached[0])
+    return cached[0]
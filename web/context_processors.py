@@ -1,8 +1,11 @@
-from .models import ZakahNisab
+from .caching import CacheVersions, get_active_nisab
 
 def zakah_nisab(request):
     try:
-        current_nisab = ZakahNisab.objects.filter(is_active=True).first()
+        current_nisab = get_active_nisab()
     except:
         current_nisab = None
-    return {'current_nisab': current_nisab} 
\ No newline at end of file
+    return {'current_nisab': current_nisab}
+
+def cache_versions(request):
+    return {'cache_versions': CacheVersions()}
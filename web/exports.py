@@ -0,0 +1,73 @@
+import csv
+import re
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# (header, lookup) pairs; the lookups are read with values_list so no model
+# instances are built while exporting
+EXPORT_COLUMNS = [
+    ('Receipt number', 'receipt_number'),
+    ('Date', 'date_contributed'),
+    ('Type', 'contribution_type'),
+    ('Zakah type', 'zakah_type'),
+    ('First name', 'first_name'),
+    ('Last name', 'last_name'),
+    ('Phone number', 'phone_number'),
+    ('District', 'district__name'),
+    ('Project', 'project__title'),
+    ('Number of people', 'number_of_people'),
+    ('Amount', 'amount'),
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Cells that spreadsheet apps would run as a formula
+FORMULA_PREFIX = re.compile(r'^[=+\-@\t\r]')
+
+# A sign is harmless when the whole cell is a number, e.g. a "+256..." phone
+# number; "-2+3+cmd|..." is not
+SIGNED_NUMBER = re.compile(r'[+-]?\d+(\.\d+)?')
+
+
+class Echo:
+    """File-like object whose write() hands back the line, so csv.writer can format rows for a generator."""
+
+    def write(self, value):
+        return value
+
+
+def safe_cell(value):
+    if isinstance(value, str) and FORMULA_PREFIX.match(value) and not SIGNED_NUMBER.fullmatch(value):
+        return "'" + value
+    return value
+
+
+def contribution_csv_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the CSV for `queryset` a chunk of rows at a time, oldest first."""
+    writer = csv.writer(Echo())
+    date_index = [lookup for _, lookup in EXPORT_COLUMNS].index('date_contributed')
+    # The byte order mark makes Excel read the file as UTF-8
+    yield '\ufeff' + writer.writerow([header for header, _ in EXPORT_COLUMNS])
+
+    rows = (
+        queryset.order_by('date_contributed', 'id')
+        .values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+    buffer = []
+    for row in rows:
+        row = [safe_cell(value) for value in row]
+        row[date_index] = timezone.localtime(row[date_index]).strftime('%Y-%m-%d %H:%M:%S')
+        buffer.append(writer.writerow(row))
+        if len(buffer) == chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def contributions_csv_response(queryset, filename='contributions.csv'):
+    response = StreamingHttpResponse(contribution_csv_rows(queryset), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
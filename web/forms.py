@@ -1,7 +1,30 @@
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.utils import timezone
+from .caching import get_district_choices, get_project_choices
 from .models import Contribution, Project, District
 
+class CachedChoiceField(forms.TypedChoiceField):
+    """
+    Stand-in for ModelChoiceField whose (pk, label) choices come from a cached
+    provider, so neither rendering nor validating it queries the database. The
+    cleaned value is an unsaved `model(pk=...)`, which is all a foreign key needs.
+    """
+
+    def __init__(self, model, get_choices, **kwargs):
+        super().__init__(
+            choices=lambda: [('', '---------')] + get_choices(),
+            coerce=lambda pk: model(pk=int(pk)),
+            empty_value=None,
+            **kwargs,
+        )
+
+
 class ContributionForm(forms.ModelForm):
+    project = CachedChoiceField(Project, get_project_choices, widget=forms.Select(attrs={'class': 'form-select'}))
+    district = CachedChoiceField(District, get_district_choices, widget=forms.Select(attrs={'class': 'form-select'}))
+
     class Meta:
         model = Contribution
         fields = ['first_name', 'last_name', 'phone_number', 'amount', 'project', 'district', 'zakah_type', 'number_of_people']
@@ -10,8 +33,6 @@ class ContributionForm(forms.ModelForm):
             'last_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter your last name'}),
             'phone_number': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter your phone number'}),
             'amount': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Enter amount'}),
-            'project': forms.Select(attrs={'class': 'form-select'}),
-            'district': forms.Select(attrs={'class': 'form-select'}),
             'zakah_type': forms.Select(attrs={'class': 'form-select'}),
             'number_of_people': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Number of people', 'min': '1'}),
         }
@@ -19,11 +40,16 @@ class ContributionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['project'].required = False
+        self.fields['district'].required = False
         self.fields['zakah_type'].required = False
         self.fields['number_of_people'].required = False
-        self.fields['project'].queryset = Project.objects.filter(is_active=True)
-        print(District.objects.all())
-        self.fields['district'].queryset = District.objects.all()
+
+    def _get_validation_exclusions(self):
+        # Already checked against the cached choices; the model's own foreign key
+        # validation would query for each of them again
+        exclude = super()._get_validation_exclusions()
+        exclude.update({'project', 'district'})
+        return exclude
 
     def clean(self):
         cleaned_data = super().clean()
@@ -33,4 +59,96 @@ class ContributionForm(forms.ModelForm):
         if zakah_type == 'FITRI' and not number_of_people:
             self.add_error('number_of_people', 'Number of people is required for Zakah al-Fitr')
         
-        return cleaned_data 
\ No newline at end of file
+        return cleaned_data 
+
+class ContributionImportForm(ContributionForm):
+    """
+    ContributionForm rules for one spreadsheet row. Districts and projects are
+    given by name and matched against lookups loaded once per import, so
+    validating a row doesn't touch the database.
+    """
+
+    # Set on the instance by hand, as ContributionCreateView does, since 'PROJECTS'
+    # isn't one of the model's choices
+    contribution_type = forms.ChoiceField(choices=Contribution.CONTRIBUTION_TYPES + [('PROJECTS', 'Projects')])
+    district = forms.CharField(required=False)
+    project = forms.CharField(required=False)
+
+    class Meta(ContributionForm.Meta):
+        fields = ['first_name', 'last_name', 'phone_number', 'amount', 'zakah_type', 'number_of_people']
+
+    def __init__(self, *args, districts, projects, **kwargs):
+        # Lowercased name/title -> pk
+        self.districts = districts
+        self.projects = projects
+        super().__init__(*args, **kwargs)
+
+    def clean_district(self):
+        return self.lookup('district', self.districts)
+
+    def clean_project(self):
+        return self.lookup('project', self.projects)
+
+    def lookup(self, field, choices):
+        name = self.cleaned_data[field].strip()
+        if not name:
+            return None
+        try:
+            return choices[name.lower()]
+        except KeyError:
+            raise forms.ValidationError(f'Unknown {field} "{name}".')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('contribution_type') == 'PROJECTS' and not cleaned_data.get('project'):
+            self.add_error('project', 'Project contributions need a project.')
+        return cleaned_data
+
+    def _post_clean(self):
+        super()._post_clean()
+        self.instance.contribution_type = self.cleaned_data.get('contribution_type')
+        self.instance.district_id = self.cleaned_data.get('district')
+        self.instance.project_id = self.cleaned_data.get('project')
+
+
+class DashboardFilterForm(forms.Form):
+    contribution_type = forms.ChoiceField(
+        choices=[('', 'All types')] + Contribution.CONTRIBUTION_TYPES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    district = forms.ModelChoiceField(
+        queryset=District.objects.all(),
+        required=False,
+        empty_label='All districts',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    project = forms.ModelChoiceField(
+        queryset=Project.objects.all(),
+        required=False,
+        empty_label='All projects',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+
+    def filter(self, queryset):
+        """Apply the cleaned filters as plain column comparisons so they can use the indexes."""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data['contribution_type']:
+            queryset = queryset.filter(contribution_type=data['contribution_type'])
+        if data['district']:
+            queryset = queryset.filter(district=data['district'])
+        if data['project']:
+            queryset = queryset.filter(project=data['project'])
+        if data['date_from']:
+            queryset = queryset.filter(date_contributed__gte=start_of_day(data['date_from']))
+        if data['date_to']:
+            queryset = queryset.filter(date_contributed__lt=start_of_day(data['date_to'] + timedelta(days=1)))
+        return queryset
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
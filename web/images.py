@@ -0,0 +1,66 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Widths of the resized copies; images narrower than one also get a copy at
+# their own width, and nothing is ever upscaled
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# extension -> Pillow format. WebP is listed first and preferred by browsers
+# that support it; JPEG is the fallback.
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+QUALITY = 80
+
+
+def variant_name(source_name, width, extension):
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/variants/{stem}-{width}w.{extension}'
+
+
+def encode(image, extension):
+    if extension == 'jpeg' and image.mode != 'RGB':
+        # No alpha channel in JPEG; flatten transparent areas onto white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    # Nothing from the original's info (EXIF, GPS, ICC, comments) is passed on
+    image.save(buffer, VARIANT_FORMATS[extension], quality=QUALITY, optimize=extension == 'jpeg')
+    return buffer.getvalue()
+
+
+def generate_variants(field_file):
+    """
+    Write resized WebP and JPEG copies of an uploaded image next to it, without
+    its metadata. Returns the upright image's (width, height) and a list of
+    {'width', 'height', 'format', 'name'} for the copies, narrowest first.
+    """
+    storage = field_file.storage
+    with field_file.open('rb'), Image.open(field_file) as original:
+        # Apply the camera's orientation tag before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    width, height = image.size
+    variants = []
+    for variant_width in sorted({min(width, candidate) for candidate in VARIANT_WIDTHS}):
+        variant_height = max(round(height * variant_width / width), 1)
+        resized = image if variant_width == width else image.resize((variant_width, variant_height), Image.LANCZOS)
+        for extension in VARIANT_FORMATS:
+            name = variant_name(field_file.name, variant_width, extension)
+            storage.delete(name)
+            name = storage.save(name, ContentFile(encode(resized, extension)))
+            variants.append({'width': variant_width, 'height': variant_height, 'format': extension, 'name': name})
+    return width, height, variants
+
+
+def delete_variants(storage, variants, keep=()):
+    for variant in variants:
+        if variant['name'] not in keep:
+            storage.delete(variant['name'])
@@ -0,0 +1,168 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('web.metrics')
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class ViewMetrics:
+    """Per-view totals since the process started. Each worker process keeps its own."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, queries, db_time, template_time, latency):
+        with self.lock:
+            stats = self.views.setdefault(view, {
+                'requests': 0, 'queries': 0, 'db_seconds': 0.0, 'template_seconds': 0.0,
+                'latency_seconds': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS),
+            })
+            stats['requests'] += 1
+            stats['queries'] += queries
+            stats['db_seconds'] += db_time
+            stats['template_seconds'] += template_time
+            stats['latency_seconds'] += latency
+            bucket = bisect_left(LATENCY_BUCKETS, latency)
+            if bucket < len(LATENCY_BUCKETS):
+                stats['buckets'][bucket] += 1
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def prometheus(self):
+        """The totals in the Prometheus text exposition format."""
+        with self.lock:
+            views = {view: dict(stats, buckets=list(stats['buckets'])) for view, stats in sorted(self.views.items())}
+
+        lines = []
+
+        def metric(name, kind, help_text, field):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for view, stats in views.items():
+                lines.append(f'{name}{{view="{view}"}} {stats[field]}')
+
+        metric('web_requests_total', 'counter', 'Requests handled, by URL name.', 'requests')
+        metric('web_db_queries_total', 'counter', 'Database queries run by requests.', 'queries')
+        metric('web_db_seconds_total', 'counter', 'Time spent in database queries.', 'db_seconds')
+        metric('web_template_seconds_total', 'counter', 'Time spent rendering templates.', 'template_seconds')
+
+        name = 'web_request_duration_seconds'
+        lines.append(f'# HELP {name} Request latency.')
+        lines.append(f'# TYPE {name} histogram')
+        for view, stats in views.items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {stats["requests"]}')
+            lines.append(f'{name}_sum{{view="{view}"}} {stats["latency_seconds"]}')
+            lines.append(f'{name}_count{{view="{view}"}} {stats["requests"]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = ViewMetrics()
+
+# Counters for the request being handled, for code that can't see the request
+current_request = contextvars.ContextVar('current_request', default=None)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            counters = current_request.get()
+            if counters is not None:
+                counters['template_time'] += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render for RequestMetricsMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure queries, database time, template rendering (with the
+    TimedDjangoTemplates backend) and total latency for each request and
+    record them under its URL name. Debug responses also
+    carry the numbers as headers. A view running more queries than its entry
+    in settings.QUERY_BUDGETS is logged, or fails the request when
+    settings.QUERY_BUDGETS_ENFORCE is on (as in the test suite).
+
+    Goes first in MIDDLEWARE so the other middleware is measured too. Queries
+    run while a streaming response is being consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        counters = {'queries': 0, 'db_time': 0.0, 'template_time': 0.0}
+
+        def count_query(execute, sql, params, many, context):
+            query_started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                counters['queries'] += 1
+                counters['db_time'] += time.perf_counter() - query_started
+
+        token = current_request.set(counters)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count_query))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+        latency = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        queries, db_time, template_time = counters['queries'], counters['db_time'], counters['template_time']
+        metrics.record(view, queries, db_time, template_time, latency)
+
+        logger.info(
+            'view=%s method=%s status=%s queries=%d db_ms=%.1f template_ms=%.1f total_ms=%.1f',
+            view, request.method, response.status_code, queries, db_time * 1000, template_time * 1000, latency * 1000,
+            extra={'view': view, 'queries': queries, 'db_time': db_time, 'template_time': template_time, 'latency': latency},
+        )
+        if settings.DEBUG:
+            response['X-Query-Count'] = queries
+            response['X-DB-Time-Ms'] = f'{db_time * 1000:.1f}'
+            response['X-Template-Time-Ms'] = f'{template_time * 1000:.1f}'
+            response['X-Response-Time-Ms'] = f'{latency * 1000:.1f}'
+
+        budget = settings.QUERY_BUDGETS.get(view)
+        if budget is not None and queries > budget:
+            message = f'{view} ran {queries} queries, over its budget of {budget}'
+            if settings.QUERY_BUDGETS_ENFORCE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,252 @@
+import json
+import math
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from web.models import Contribution, ContributionRollup, District, Project
+
+# 'mixed' is donation POSTs and receipt reads, half each, to show writers and
+# readers contending for the database
+TARGETS = ('pay_zakah', 'receipt', 'statistics', 'dashboard', 'contribution_list', 'mixed')
+
+# 'warm' serves from whatever the warm-up requests cached, anonymous pages
+# included; 'cold' clears the cache before every request, so each one renders
+# the page and runs its queries
+CACHE_MODES = ('warm', 'cold')
+
+SEED_TYPES = ('ZAKAH', 'SADAQA', 'FITRA', 'PROJECTS')
+
+
+def percentile(sorted_values, percent):
+    # Nearest-rank, so p99 of a small sample is an observed value
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a separate SQLite database and report p50/p99 latency and queries per request '
+        'for the donation, receipt, statistics, dashboard and contribution list paths, with warm '
+        'and with cold caches, as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contributions', type=int, default=10000)
+        parser.add_argument('--districts', type=int, default=20)
+        parser.add_argument('--projects', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per target and mode')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--threads', type=int, default=8, help='Workers for the threaded run; 0 skips it')
+        parser.add_argument('--targets', nargs='+', choices=TARGETS, default=TARGETS)
+        parser.add_argument('--random-seed', type=int, default=1)
+        parser.add_argument('--database', default=str(settings.BASE_DIR / 'benchmark.sqlite3'))
+        parser.add_argument('--keepdb', action='store_true', help='Reuse an already seeded benchmark database')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+        parser.add_argument(
+            '--sqlite-defaults', action='store_true',
+            help='Run without the pragmas, BEGIN IMMEDIATE and persistent connections, for comparison',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['random_seed'])
+        connection.settings_dict['TEST']['NAME'] = options['database']
+        if options['sqlite_defaults']:
+            connection.settings_dict['OPTIONS'] = {}
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        for alias in connections:
+            # Point the read replica (see READ_REPLICA) at the benchmark database too
+            if connections[alias].settings_dict['TEST']['MIRROR'] == DEFAULT_DB_ALIAS:
+                connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            if options['sqlite_defaults'] and connection.vendor == 'sqlite':
+                # WAL is stored in the database file, so a --keepdb file may still have it
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode=DELETE')
+            if not Contribution.objects.exists():
+                self.seed(options['contributions'], options['districts'], options['projects'])
+            self.receipt_ids = list(Contribution.objects.values_list('id', flat=True))
+            User.objects.get_or_create(username='benchmark')
+
+            results = {}
+            for target in options['targets']:
+                results[target] = {}
+                for mode in CACHE_MODES:
+                    cold = mode == 'cold'
+                    results[target][mode] = {
+                        'sequential': self.measure(target, options['requests'], options['warmup'], 1, cold),
+                    }
+                    if options['threads']:
+                        results[target][mode]['threaded'] = self.measure(
+                            target, options['requests'], options['warmup'], options['threads'], cold,
+                        )
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = json.dumps({
+            'commit': self.commit(),
+            'timestamp': timezone.now().isoformat(),
+            'volumes': {key: options[key] for key in ('contributions', 'districts', 'projects')},
+            'requests': options['requests'],
+            'threads': options['threads'],
+            'sqlite_defaults': options['sqlite_defaults'],
+            'results': results,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}.'))
+        else:
+            self.stdout.write(report)
+
+    def seed(self, contributions, districts, projects):
+        district_ids = [
+            district.pk for district in District.objects.bulk_create(
+                District(name=f'District {index}', date_created=timezone.now()) for index in range(districts)
+            )
+        ]
+        project_ids = [
+            project.pk for project in Project.objects.bulk_create(
+                Project(title=f'Project {index}', description='Benchmark project', target_amount=10_000_000)
+                for index in range(projects)
+            )
+        ]
+        batch = []
+        for index in range(contributions):
+            contribution_type = self.random.choice(SEED_TYPES)
+            batch.append(Contribution(
+                first_name='Donor', last_name=str(index), phone_number=f'07{index:08d}',
+                contribution_type=contribution_type,
+                amount=Decimal(self.random.randint(1, 500) * 1000),
+                district_id=self.random.choice(district_ids) if district_ids else None,
+                project_id=self.random.choice(project_ids) if contribution_type == 'PROJECTS' and project_ids else None,
+                receipt_number=f'SEED{index:010d}',
+            ))
+            if len(batch) == 5000:
+                Contribution.objects.bulk_create(batch)
+                batch = []
+        Contribution.objects.bulk_create(batch)
+
+        # auto_now_add stamped every row with now; spread them over the past year
+        # in id order, one range UPDATE per day
+        ids = list(Contribution.objects.order_by('id').values_list('id', flat=True))
+        now = timezone.now()
+        per_day = math.ceil(len(ids) / 365) if ids else 1
+        for day, start in enumerate(range(0, len(ids), per_day)):
+            chunk = ids[start:start + per_day]
+            Contribution.objects.filter(id__range=(chunk[0], chunk[-1])).update(
+                date_contributed=now - timedelta(days=364 - day)
+            )
+
+        ContributionRollup.objects.rebuild()
+        call_command('reconcile_counters', stdout=StringIO())
+        call_command('reconcile_project_totals', stdout=StringIO())
+
+    def request(self, client, target):
+        if target == 'mixed':
+            target = self.random.choice(('pay_zakah', 'receipt'))
+        if target == 'pay_zakah':
+            return client.post(reverse('web:pay_zakah'), {
+                'first_name': 'Bench', 'last_name': 'Mark', 'phone_number': '0700000000', 'amount': '10000',
+            })
+        if target == 'receipt':
+            return client.get(reverse('web:receipt', args=[self.random.choice(self.receipt_ids)]))
+        if target == 'statistics':
+            return client.get(reverse('web:overall_contributions'))
+        if target == 'dashboard':
+            return client.get(reverse('web:dashboard'))
+        return client.get(reverse('web:contribution_list', args=['ZAKAH']))
+
+    def client_for(self, target):
+        client = Client()
+        if target == 'dashboard':
+            client.force_login(User.objects.get(username='benchmark'))
+        return client
+
+    def measure(self, target, requests, warmup, threads, cold=False):
+        cache.clear()
+        samples = []
+
+        def run(count, record):
+            client = self.client_for(target)
+            queries = [0]
+
+            def count_query(execute, sql, params, many, context):
+                queries[0] += 1
+                return execute(sql, params, many, context)
+
+            try:
+                with ExitStack() as stack:
+                    # Every alias, so reads routed to a replica are counted too
+                    for alias_connection in connections.all():
+                        stack.enter_context(alias_connection.execute_wrapper(count_query))
+                    for _ in range(count):
+                        if cold:
+                            cache.clear()
+                        queries[0] = 0
+                        started = time.perf_counter()
+                        locked = False
+                        try:
+                            status = self.request(client, target).status_code
+                        except OperationalError as e:
+                            status, locked = None, 'locked' in str(e)
+                        except Exception:
+                            status = None
+                        if record:
+                            samples.append((time.perf_counter() - started, queries[0], status, locked))
+            finally:
+                if threads > 1:
+                    connections.close_all()
+
+        run(warmup, record=False)
+        started = time.perf_counter()
+        if threads > 1:
+            share, extra = divmod(requests, threads)
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(lambda worker: run(share + (worker < extra), True), range(threads)))
+        else:
+            run(requests, record=True)
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _, _, _ in samples)
+        queries = [count for _, count, _, _ in samples]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for _, _, status, _ in samples if status is None or status >= 400),
+            'lock_errors': sum(1 for _, _, _, locked in samples if locked),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+            'queries_per_request': round(sum(queries) / len(queries), 2),
+            'max_queries': max(queries),
+            'requests_per_second': round(len(samples) / elapsed, 1),
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
@@ -0,0 +1,68 @@
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from web.exports import EXPORT_CHUNK_SIZE, contribution_csv_rows
+from web.models import Contribution
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure the CSV export in rows per second, optionally against seeded rows that are rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Insert this many throwaway contributions first')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Also report peak Python memory; tracing allocations slows the export several times over',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                self.run(options['chunk_size'], options['memory'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        # bulk_create skips Contribution.save(), so counters and rollups are untouched
+        batch = []
+        for index in range(count):
+            batch.append(Contribution(
+                first_name='Bench', last_name=f'Donor {index}', phone_number='0700000000',
+                contribution_type='SADAQA', amount=Decimal('1000'), receipt_number=f'BENCH{index:09d}',
+            ))
+            if len(batch) == 5000:
+                Contribution.objects.bulk_create(batch)
+                batch = []
+        Contribution.objects.bulk_create(batch)
+
+    def run(self, chunk_size, trace_memory):
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        lines = size = 0
+        for chunk in contribution_csv_rows(Contribution.objects.all(), chunk_size=chunk_size):
+            lines += chunk.count('\n')
+            size += len(chunk.encode())
+        elapsed = time.perf_counter() - started
+
+        rows = lines - 1
+        report = (
+            f'Exported {rows} row(s), {size / 1024 / 1024:.1f} MiB in {elapsed:.2f}s: '
+            f'{rows / elapsed if elapsed else 0:,.0f} rows/s'
+        )
+        if trace_memory:
+            report += f', peak memory {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MiB'
+            tracemalloc.stop()
+        self.stdout.write(report)
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from web.caching import bump_version
+
+MODELS = ('web.Gallery', 'web.Project')
+
+
+def init_worker():
+    # Forked workers must not share the parent's database connections; spawned
+    # ones start without Django set up
+    connections.close_all()
+    django.setup()
+
+
+def process(label, pk):
+    instance = apps.get_model(label).objects.get(pk=pk)
+    instance.generate_image_variants()
+
+
+class Command(BaseCommand):
+    help = 'Make the resized, metadata-free copies of gallery and project images that lack them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate copies for every image')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Worker processes; 1 processes the images in this process',
+        )
+
+    def handle(self, *args, **options):
+        jobs = []
+        for label in MODELS:
+            for instance in apps.get_model(label).objects.exclude(image='').exclude(image__isnull=True).iterator():
+                if options['force'] or instance.image_needs_variants():
+                    jobs.append((label, instance.pk))
+
+        failed = 0
+        if options['workers'] > 1 and len(jobs) > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+                futures = {pool.submit(process, *job): job for job in jobs}
+                for future in as_completed(futures):
+                    failed += not self.attempt(futures[future], future.result)
+        else:
+            for job in jobs:
+                failed += not self.attempt(job, lambda: process(*job))
+
+        if len(jobs) > failed:
+            bump_version('gallery', 'projects')
+        self.stdout.write(self.style.SUCCESS(f'Made variants for {len(jobs) - failed} image(s); {failed} failed.'))
+
+    def attempt(self, job, run):
+        try:
+            run()
+            return True
+        except (OSError, ObjectDoesNotExist) as e:
+            self.stderr.write(f'{job[0]} {job[1]}: {e}')
+            return False
@@ -0,0 +1,123 @@
+import csv
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from web.caching import bump_version
+from web.forms import ContributionImportForm
+from web.models import Contribution, ContributionCounter, ContributionRollup, District, Project, ReceiptSequence
+
+
+class Command(BaseCommand):
+    help = (
+        'Import contributions from a CSV with the columns contribution_type, first_name, last_name, '
+        'phone_number, amount and optionally district, project, zakah_type and number_of_people'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without saving anything')
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Skip this many data rows, e.g. to resume after an interrupted import',
+        )
+
+    def handle(self, *args, **options):
+        districts = {name.lower(): pk for pk, name in District.objects.values_list('pk', 'name')}
+        projects = {title.lower(): pk for pk, title in Project.objects.filter(is_active=True).values_list('pk', 'title')}
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        started = time.perf_counter()
+        imported = invalid = 0
+        # Data rows covered by committed batches
+        self.saved_through = processed = options['offset']
+        batch = []
+        with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+            for index, row in enumerate(csv.DictReader(csv_file)):
+                if index < options['offset']:
+                    continue
+                form = ContributionImportForm(row, districts=districts, projects=projects)
+                if form.is_valid():
+                    batch.append(form.instance)
+                else:
+                    invalid += 1
+                    errors = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in form.errors.items())
+                    # Row 1 of the file is the header
+                    self.stderr.write(f'Row {index + 2}: {errors}')
+                processed = index + 1
+
+                if len(batch) == batch_size:
+                    imported += self.save_batch(batch, dry_run, processed)
+                    batch = []
+            if batch:
+                imported += self.save_batch(batch, dry_run, processed)
+
+        if imported and not dry_run:
+            bump_version('contributions', 'projects')
+        elapsed = time.perf_counter() - started
+        verb = 'Validated' if dry_run else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {imported} contribution(s), skipped {invalid} invalid row(s) in {elapsed:.1f}s '
+            f'({imported / elapsed if elapsed else 0:,.0f} rows/s).'
+        ))
+
+    def save_batch(self, contributions, dry_run, processed):
+        if dry_run:
+            return len(contributions)
+        try:
+            with transaction.atomic():
+                self.assign_receipt_numbers(contributions)
+                Contribution.objects.bulk_create(contributions)
+                self.apply_totals(contributions)
+        except DatabaseError as e:
+            raise CommandError(f'{e}\nEarlier batches were saved; resume with --offset {self.saved_through}.')
+        self.saved_through = processed
+        self.stdout.write(f'Saved {len(contributions)} contribution(s); --offset {processed} resumes after them.')
+        return len(contributions)
+
+    def assign_receipt_numbers(self, contributions):
+        # One block of numbers per prefix instead of one allocation per row
+        day = timezone.localdate()
+        by_prefix = defaultdict(list)
+        for contribution in contributions:
+            by_prefix[contribution.contribution_type[:3].upper()].append(contribution)
+        for prefix, group in by_prefix.items():
+            first = ReceiptSequence.objects.allocate(prefix, day, count=len(group))
+            for number, contribution in enumerate(group, start=first):
+                contribution.receipt_number = ReceiptSequence.format_receipt_number(prefix, day, number)
+
+    def apply_totals(self, contributions):
+        """Add the batch to counters, rollups and project totals with one update per distinct key."""
+        counters = defaultdict(lambda: [0, 0])
+        rollups = {}
+        projects = defaultdict(int)
+        for contribution in contributions:
+            source = contribution.rollup_source()
+            counters[contribution.contribution_type][0] += 1
+            counters[contribution.contribution_type][1] += source['amount']
+
+            key = (
+                timezone.localdate(contribution.date_contributed),
+                contribution.contribution_type,
+                contribution.district_id,
+                contribution.project_id,
+            )
+            if key not in rollups:
+                rollups[key] = dict(source, amount=0, count=0)
+            rollups[key]['count'] += 1
+            rollups[key]['amount'] += source['amount']
+
+            if contribution.contribution_type == 'PROJECTS':
+                projects[contribution.project_id] += source['amount']
+
+        for contribution_type, (count, amount) in counters.items():
+            ContributionCounter.objects.increment(contribution_type, amount, count=count)
+        for rollup in rollups.values():
+            ContributionRollup.objects.add(**rollup)
+        for project_id, amount in projects.items():
+            Project.objects.add_contribution('PROJECTS', project_id, amount)
@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from web.caching import bump_version
+from web.models import ContributionRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily ContributionRollup table from Contribution'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Only rebuild days on or after this date (YYYY-MM-DD); defaults to everything',
+        )
+
+    def handle(self, *args, **options):
+        rows = ContributionRollup.objects.rebuild(since=options['since'])
+        bump_version('contributions')
+        since = options['since'].isoformat() if options['since'] else 'the beginning'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup row(s) from {since}.'))
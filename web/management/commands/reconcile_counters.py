@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from web.caching import bump_version
+from web.models import Contribution, ContributionCounter
+
+
+class Command(BaseCommand):
+    help = 'Compare ContributionCounter shards against Contribution totals and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without repairing it')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            actual = {
+                row['contribution_type']: row
+                for row in Contribution.objects.values('contribution_type').annotate(
+                    actual_count=Count('id'), actual_amount=Sum('amount')
+                )
+            }
+            counted = {counter.contribution_type: counter for counter in ContributionCounter.objects.totals()}
+
+            drifted = 0
+            for contribution_type in sorted(actual.keys() | counted.keys()):
+                row = actual.get(contribution_type, {})
+                counter = counted.get(contribution_type, ContributionCounter(count=0, total_amount=0))
+                count_drift = row.get('actual_count', 0) - counter.count
+                amount_drift = (row.get('actual_amount') or 0) - counter.total_amount
+                if not count_drift and not amount_drift:
+                    continue
+
+                drifted += 1
+                self.stdout.write(
+                    f'{contribution_type}: count {counter.count} -> {counter.count + count_drift}, '
+                    f'amount {counter.total_amount} -> {counter.total_amount + amount_drift}'
+                )
+                if not options['dry_run']:
+                    # Fold the difference into shard 0 with F() so increments landing
+                    # concurrently on other shards are kept.
+                    shard, _ = ContributionCounter.objects.get_or_create(contribution_type=contribution_type, shard=0)
+                    ContributionCounter.objects.filter(pk=shard.pk).update(
+                        count=F('count') + count_drift,
+                        total_amount=F('total_amount') + amount_drift,
+                    )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All counters match contributions.'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{drifted} counter(s) drifted; run without --dry-run to repair.'))
+        else:
+            bump_version('contributions')
+            self.stdout.write(self.style.SUCCESS(f'Repaired {drifted} counter(s).'))
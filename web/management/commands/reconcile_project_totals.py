@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+
+from web.caching import bump_version
+from web.models import Contribution, Project
+
+
+class Command(BaseCommand):
+    help = "Recompute every project's current_amount from Contribution and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without repairing it')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            actual = dict(
+                Contribution.objects.filter(contribution_type='PROJECTS', project__isnull=False)
+                .order_by()
+                .values_list('project')
+                .annotate(total=Sum('amount'))
+            )
+            drifted = []
+            for project_id, title, current_amount in Project.objects.values_list('id', 'title', 'current_amount'):
+                drift = actual.get(project_id, 0) - current_amount
+                if drift:
+                    drifted.append((project_id, drift))
+                    self.stdout.write(f'{title}: {current_amount} -> {current_amount + drift}')
+
+            if not options['dry_run']:
+                # Apply the difference with F() so donations landing meanwhile are kept
+                for project_id, drift in drifted:
+                    Project.objects.filter(pk=project_id).update(current_amount=F('current_amount') + drift)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All project totals match contributions.'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} project total(s) drifted; run without --dry-run to repair.'))
+        else:
+            bump_version('projects')
+            self.stdout.write(self.style.SUCCESS(f'Repaired {len(drifted)} project total(s).'))
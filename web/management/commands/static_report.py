@@ -0,0 +1,70 @@
+import os
+import re
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+PAGES = ('home', 'pay_zakah', 'gallery', 'projects', 'activities', 'overall_contributions')
+
+
+class Command(BaseCommand):
+    help = (
+        'Render pages and compare the bytes of the local CSS, JS and images they reference as written '
+        'in static/ with what is served after collectstatic minified (CSS) and compressed them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', nargs='+', default=PAGES, help='URL names of pages without arguments')
+
+    def handle(self, *args, **options):
+        hashed_files = getattr(staticfiles_storage, 'hashed_files', None)
+        if not hashed_files:
+            raise CommandError('No staticfiles manifest found; run collectstatic first.')
+        self.originals = {hashed: name for name, hashed in hashed_files.items()}
+        self.prefix = urlparse(settings.STATIC_URL).path
+        assets = re.compile(r'(?:href|src)="{}([^"?#]+)'.format(re.escape(self.prefix)))
+
+        setup_test_environment()
+        try:
+            client = Client()
+            rows = []
+            for page in options['pages']:
+                response = client.get(reverse(f'web:{page}'))
+                if response.status_code != 200:
+                    raise CommandError(f'{page} returned {response.status_code}.')
+                html = response.content.decode()
+                source = served = 0
+                for name in sorted(set(assets.findall(html))):
+                    source_size, served_size = self.sizes(name)
+                    source += source_size
+                    served += served_size
+                rows.append((page, len(response.content), source, served))
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f'{"page":<24}{"html":>10}{"static":>10}{"served":>10}{"saved":>10}{"saved %":>9}')
+        for page, html, source, served in rows:
+            saved = source - served
+            self.stdout.write(
+                f'{page:<24}{html:>10,}{source:>10,}{served:>10,}{saved:>10,}{saved / source if source else 0:>9.0%}'
+            )
+        self.stdout.write('Repeat visits fetch none of the hashed files; they are cached for a year.')
+
+    def sizes(self, name):
+        """Size of the file as written in static/ and of the smallest copy served for it."""
+        served_path = os.path.join(settings.STATIC_ROOT, name)
+        if not os.path.isfile(served_path):
+            raise CommandError(f'{name} is not in STATIC_ROOT; run collectstatic again.')
+        source_path = finders.find(self.originals.get(name, name))
+        served = min(
+            os.path.getsize(path)
+            for path in (served_path, served_path + '.gz', served_path + '.br')
+            if os.path.isfile(path)
+        )
+        return os.path.getsize(source_path) if source_path else served, served
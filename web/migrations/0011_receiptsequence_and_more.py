@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:43
+
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def seed_receipt_sequences(apps, schema_editor):
+    # Continue numbering after receipts issued by the old "latest receipt + 1" scan
+    Contribution = apps.get_model('web', 'Contribution')
+    ReceiptSequence = apps.get_model('web', 'ReceiptSequence')
+    last_numbers = {}
+    for receipt_number in Contribution.objects.values_list('receipt_number', flat=True).iterator():
+        try:
+            key = (receipt_number[:3], datetime.strptime(receipt_number[3:9], '%y%m%d').date())
+            number = int(receipt_number[9:])
+        except ValueError:
+            continue
+        last_numbers[key] = max(last_numbers.get(key, 0), number)
+    ReceiptSequence.objects.bulk_create(
+        ReceiptSequence(prefix=prefix, date=day, last_number=number)
+        for (prefix, day), number in last_numbers.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0010_alter_contribution_district'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='receiptsequence',
+            constraint=models.UniqueConstraint(fields=('prefix', 'date'), name='unique_receipt_sequence_per_day'),
+        ),
+        migrations.RunPython(seed_receipt_sequences, migrations.RunPython.noop),
+    ]
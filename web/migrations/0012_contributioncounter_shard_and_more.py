@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0011_receiptsequence_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contributioncounter',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='contributioncounter',
+            name='contribution_type',
+            field=models.CharField(choices=[('ZAKAH', 'Zakah'), ('SADAQA', 'Sadaqa'), ('FITRA', 'Fitra'), ('OTHER', 'Other')], max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='contributioncounter',
+            constraint=models.UniqueConstraint(fields=('contribution_type', 'shard'), name='unique_counter_shard_per_type'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:46
+
+import django.db.models.deletion
+import django.db.models.functions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    Contribution = apps.get_model('web', 'Contribution')
+    ContributionRollup = apps.get_model('web', 'ContributionRollup')
+    rows = (
+        Contribution.objects.annotate(day=django.db.models.functions.TruncDate('date_contributed'))
+        .order_by()
+        .values('day', 'contribution_type', 'district_id', 'project_id')
+        .annotate(contribution_count=models.Count('id'), amount=models.Sum('amount'))
+    )
+    ContributionRollup.objects.bulk_create(
+        (
+            ContributionRollup(
+                date=row['day'],
+                contribution_type=row['contribution_type'],
+                district_id=row['district_id'],
+                project_id=row['project_id'],
+                count=row['contribution_count'],
+                total_amount=row['amount'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0012_contributioncounter_shard_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContributionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('contribution_type', models.CharField(choices=[('ZAKAH', 'Zakah'), ('SADAQA', 'Sadaqa'), ('FITRA', 'Fitra'), ('OTHER', 'Other')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('district', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='web.district')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='web.project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='contributionrollup',
+            constraint=models.UniqueConstraint(models.F('date'), models.F('contribution_type'), django.db.models.functions.comparison.Coalesce('district', 0), django.db.models.functions.comparison.Coalesce('project', 0), name='unique_rollup_per_day_type_district_project'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0013_contributionrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['date_contributed', 'id'], name='contribution_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['contribution_type', 'date_contributed', 'id'], name='contribution_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['district', 'date_contributed', 'id'], name='contribution_district_date_idx'),
+        ),
+    ]
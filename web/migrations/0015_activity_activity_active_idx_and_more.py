@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0014_contribution_contribution_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['frequency', 'schedule_details'], name='activity_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['project', 'contribution_type'], name='contribution_project_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at'], name='project_active_idx'),
+        ),
+    ]
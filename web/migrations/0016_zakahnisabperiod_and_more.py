@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_periods(apps, schema_editor):
+    ZakahNisab = apps.get_model('web', 'ZakahNisab')
+    ZakahNisabPeriod = apps.get_model('web', 'ZakahNisabPeriod')
+    # Concurrent saves could have left several rows active; keep the newest
+    latest = ZakahNisab.objects.filter(is_active=True).order_by('-last_updated', '-id').first()
+    if latest:
+        ZakahNisab.objects.filter(is_active=True).exclude(pk=latest.pk).update(is_active=False)
+        # Its last change is the only record of when it took effect
+        ZakahNisabPeriod.objects.create(
+            nisab=latest, amount=latest.amount, currency=latest.currency, effective_from=latest.last_updated
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0015_activity_activity_active_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZakahNisabPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('currency', models.CharField(max_length=10)),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('nisab', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='periods', to='web.zakahnisab')),
+            ],
+            options={
+                'verbose_name': 'Zakah Nisab period',
+                'indexes': [models.Index(fields=['effective_from', 'id'], name='zakahnisabperiod_effective_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_periods, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='zakahnisab',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='single_active_zakah_nisab'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0017_gallery_project_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gallery',
+            index=models.Index(fields=['date_added', 'id'], name='gallery_date_idx'),
+        ),
+    ]
@@ -1,7 +1,29 @@
-from django.db import models
-from django.db.models import Sum
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.db.models import Case, Count, F, Min, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round, TruncDate
 from django.utils import timezone
 
+from . import images
+
+
+def increment_or_create(manager, lookup, increments):
+    """Add `increments` to the row matching `lookup` with one UPDATE, inserting the row if it is missing."""
+    rows = manager.filter(**lookup)
+    changes = {field: F(field) + value for field, value in increments.items()}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            manager.create(**lookup, **increments)
+    except IntegrityError:
+        # Another request inserted the row first
+        rows.update(**changes)
+
+
 class Contribution(models.Model):
     CONTRIBUTION_TYPES = [
         ('ZAKAH', 'Zakah'),
@@ -27,32 +49,41 @@ class Contribution(models.Model):
     district = models.ForeignKey('District', on_delete=models.SET_NULL, null=True, blank=True)
     project = models.ForeignKey('Project', on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination on (date_contributed, id), alone or after an equality filter
+            models.Index(fields=['date_contributed', 'id'], name='contribution_date_idx'),
+            models.Index(fields=['contribution_type', 'date_contributed', 'id'], name='contribution_type_date_idx'),
+            models.Index(fields=['district', 'date_contributed', 'id'], name='contribution_district_date_idx'),
+            # Project.supporter_count: project=... AND contribution_type='PROJECTS'
+            models.Index(fields=['project', 'contribution_type'], name='contribution_project_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.get_contribution_type_display()} - {self.amount}"
 
+    def rollup_source(self):
+        source = {field: getattr(self, field) for field in ContributionRollup.SOURCE_FIELDS}
+        source['amount'] = self._meta.get_field('amount').to_python(self.amount)
+        return source
+
     def save(self, *args, **kwargs):
-        if not self.receipt_number:
-            # Generate receipt number
-            prefix = self.contribution_type[:3].upper()
-            date_str = self.date_contributed.strftime('%y%m%d')
-            last_receipt = Contribution.objects.filter(
-                receipt_number__startswith=f'{prefix}{date_str}'
-            ).order_by('-receipt_number').first()
-            
-            if last_receipt:
-                last_num = int(last_receipt.receipt_number[-4:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-                
-            self.receipt_number = f'{prefix}{date_str}{new_num:04d}'
-        
-        super().save(*args, **kwargs)
-        
-        # Update project current amount if this is a project contribution
-        if self.contribution_type == 'PROJECTS' and self.project:
-            self.project.current_amount += self.amount
-            self.project.save()
+        with transaction.atomic():
+            if not self.receipt_number:
+                self.receipt_number = ReceiptSequence.objects.next_receipt_number(self.contribution_type)
+            previous = None
+            if not self._state.adding:
+                previous = Contribution.objects.filter(pk=self.pk).values(*ContributionRollup.SOURCE_FIELDS).first()
+            super().save(*args, **kwargs)
+
+            current = self.rollup_source()
+            if previous != current:
+                if previous:
+                    ContributionRollup.objects.remove(**previous)
+                    Project.objects.add_contribution(**previous, sign=-1)
+                ContributionRollup.objects.add(**current)
+                # Update project current amount if this is a project contribution
+                Project.objects.add_contribution(**current)
 
 
 class District(models.Model): 
@@ -66,26 +97,250 @@ class District(models.Model):
         return self.contribution_set.all()
 
     def total_amount(self):
-        return self.contribution_set.aggregate(total=Sum('amount'))['total'] or 0
+        return self.rollups.aggregate(total=Sum('total_amount'))['total'] or 0
 
 
-class Gallery(models.Model):
+class ResponsiveImageModel(models.Model):
+    """
+    Dimensions and resized copies (see web.images) of the subclass's `image`
+    field, for srcset/width/height in templates. They are made when an image is
+    saved (web.signals) or by the generate_image_variants command.
+    """
+
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # {'source': image name the copies were made from, 'variants': [{'width', 'height', 'format', 'name'}, ...]}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def image_needs_variants(self):
+        return bool(self.image) and self.image_variants.get('source') != self.image.name
+
+    def generate_image_variants(self):
+        storage = self.image.storage
+        width, height, variants = images.generate_variants(self.image)
+        images.delete_variants(
+            storage, self.image_variants.get('variants', []), keep={variant['name'] for variant in variants},
+        )
+        self.image_width, self.image_height = width, height
+        self.image_variants = {'source': self.image.name, 'variants': variants}
+        # update() rather than save() so saving doesn't come back here through post_save
+        type(self).objects.filter(pk=self.pk).update(
+            image_width=width, image_height=height, image_variants=self.image_variants,
+        )
+
+    def image_srcset(self, extension):
+        storage = self.image.storage
+        return ', '.join(
+            f"{storage.url(variant['name'])} {variant['width']}w"
+            for variant in self.image_variants.get('variants', []) if variant['format'] == extension
+        )
+
+    @property
+    def webp_srcset(self):
+        return self.image_srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.image_srcset('jpeg')
+
+    def thumbnail(self, max_width=640):
+        """URL and size of the widest JPEG copy no wider than `max_width`, or of the original."""
+        jpegs = [
+            variant for variant in self.image_variants.get('variants', [])
+            if variant['format'] == 'jpeg' and variant['width'] <= max_width
+        ]
+        if jpegs:
+            return {'url': self.image.storage.url(jpegs[-1]['name']), 'width': jpegs[-1]['width'], 'height': jpegs[-1]['height']}
+        return {'url': self.image.url, 'width': self.image_width, 'height': self.image_height}
+
+    @property
+    def image_src(self):
+        """The widest JPEG copy, for browsers without srcset support."""
+        jpegs = [variant for variant in self.image_variants.get('variants', []) if variant['format'] == 'jpeg']
+        return self.image.storage.url(jpegs[-1]['name']) if jpegs else self.image.url
+
+
+class Gallery(ResponsiveImageModel):
     title = models.CharField(max_length=200)
     description = models.TextField()
     image = models.ImageField(upload_to='gallery/')
     date_added = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # GalleryView keyset pagination, newest first
+            models.Index(fields=['date_added', 'id'], name='gallery_date_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+class ContributionCounterManager(models.Manager):
+    def increment(self, contribution_type, amount, count=1):
+        # Spread writes over several rows per type so concurrent donations
+        # don't all wait on the same row lock.
+        shard = random.randrange(settings.CONTRIBUTION_COUNTER_SHARDS)
+        increment_or_create(
+            self,
+            {'contribution_type': contribution_type, 'shard': shard},
+            {'count': count, 'total_amount': amount},
+        )
+
+    def totals(self):
+        """Return one unsaved ContributionCounter per type with its shards summed."""
+        rows = (
+            self.values('contribution_type')
+            .annotate(shard_count=Sum('count'), shard_amount=Sum('total_amount'), first_id=Min('id'))
+            .order_by('first_id')
+        )
+        return [
+            ContributionCounter(
+                contribution_type=row['contribution_type'],
+                count=row['shard_count'],
+                total_amount=row['shard_amount'],
+            )
+            for row in rows
+        ]
+
+    def total_for(self, contribution_type):
+        totals = self.filter(contribution_type=contribution_type).aggregate(
+            shard_count=Sum('count'), shard_amount=Sum('total_amount')
+        )
+        return ContributionCounter(
+            contribution_type=contribution_type,
+            count=totals['shard_count'] or 0,
+            total_amount=totals['shard_amount'] or 0,
+        )
+
 class ContributionCounter(models.Model):
-    contribution_type = models.CharField(max_length=10, choices=Contribution.CONTRIBUTION_TYPES, unique=True)
+    contribution_type = models.CharField(max_length=10, choices=Contribution.CONTRIBUTION_TYPES)
+    shard = models.PositiveSmallIntegerField(default=0)
     count = models.IntegerField(default=0)
     total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
 
+    objects = ContributionCounterManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contribution_type', 'shard'], name='unique_counter_shard_per_type'),
+        ]
+
     def __str__(self):
         return f"{self.contribution_type} - {self.count} contributions"
 
+class ReceiptSequenceManager(models.Manager):
+    def allocate(self, prefix, day, count=1):
+        """Reserve `count` consecutive numbers for (prefix, day) and return the first one."""
+        with transaction.atomic():
+            # The UPDATE runs first so the row (or, on SQLite, the database) is write-locked
+            # before anything is read; concurrent callers queue behind it instead of racing.
+            increment_or_create(self, {'prefix': prefix, 'date': day}, {'last_number': count})
+            last_number = self.filter(prefix=prefix, date=day).values_list('last_number', flat=True).get()
+        return last_number - count + 1
+
+    def next_receipt_number(self, contribution_type, day=None):
+        prefix = contribution_type[:3].upper()
+        day = day or timezone.localdate()
+        number = self.allocate(prefix, day)
+        return ReceiptSequence.format_receipt_number(prefix, day, number)
+
+class ReceiptSequence(models.Model):
+    prefix = models.CharField(max_length=3)
+    date = models.DateField()
+    last_number = models.PositiveIntegerField(default=0)
+
+    objects = ReceiptSequenceManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'date'], name='unique_receipt_sequence_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.prefix} {self.date:%Y-%m-%d} - {self.last_number}"
+
+    @staticmethod
+    def format_receipt_number(prefix, day, number):
+        return f'{prefix}{day:%y%m%d}{number:04d}'
+
+class ContributionRollupManager(models.Manager):
+    def add(self, date_contributed, contribution_type, district_id, project_id, amount, count=1):
+        increment_or_create(
+            self,
+            {
+                'date': timezone.localdate(date_contributed),
+                'contribution_type': contribution_type,
+                'district_id': district_id,
+                'project_id': project_id,
+            },
+            {'count': count, 'total_amount': amount},
+        )
+
+    def remove(self, amount, count=1, **key):
+        self.add(amount=-amount, count=-count, **key)
+
+    def rebuild(self, since=None):
+        """Recompute every rollup row from `since` (a date, or everything) out of Contribution."""
+        contributions = Contribution.objects.all()
+        rollups = self.all()
+        if since:
+            contributions = contributions.filter(date_contributed__date__gte=since)
+            rollups = rollups.filter(date__gte=since)
+        rows = (
+            contributions.annotate(day=TruncDate('date_contributed'))
+            .order_by()
+            .values('day', 'contribution_type', 'district_id', 'project_id')
+            .annotate(contribution_count=Count('id'), amount=Sum('amount'))
+        )
+        with transaction.atomic():
+            rollups.delete()
+            created = self.bulk_create(
+                (
+                    ContributionRollup(
+                        date=row['day'],
+                        contribution_type=row['contribution_type'],
+                        district_id=row['district_id'],
+                        project_id=row['project_id'],
+                        count=row['contribution_count'],
+                        total_amount=row['amount'],
+                    )
+                    for row in rows.iterator()
+                ),
+                batch_size=1000,
+            )
+        return len(created)
+
+class ContributionRollup(models.Model):
+    # Contribution fields that decide which rollup row a contribution belongs to
+    SOURCE_FIELDS = ('date_contributed', 'contribution_type', 'district_id', 'project_id', 'amount')
+
+    date = models.DateField()
+    contribution_type = models.CharField(max_length=10, choices=Contribution.CONTRIBUTION_TYPES)
+    district = models.ForeignKey(District, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups')
+    project = models.ForeignKey('Project', on_delete=models.CASCADE, null=True, blank=True, related_name='rollups')
+    count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    objects = ContributionRollupManager()
+
+    class Meta:
+        constraints = [
+            # Coalesce so contributions without a district/project share one row per day
+            models.UniqueConstraint(
+                'date',
+                'contribution_type',
+                Coalesce('district', 0),
+                Coalesce('project', 0),
+                name='unique_rollup_per_day_type_district_project',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date:%Y-%m-%d} {self.contribution_type} - {self.count} contributions"
+
 class Activity(models.Model):
     FREQUENCY_CHOICES = [
         ('DAILY', 'Daily'),
@@ -108,11 +363,40 @@ class Activity(models.Model):
     class Meta:
         verbose_name_plural = "Activities"
         ordering = ['frequency', 'schedule_details']
+        indexes = [
+            # ActivityListView: is_active=True in the default ordering
+            models.Index(
+                fields=['frequency', 'schedule_details'],
+                condition=models.Q(is_active=True),
+                name='activity_active_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
-class Project(models.Model):
+class ProjectQuerySet(models.QuerySet):
+    def add_contribution(self, contribution_type, project_id, amount, sign=1, **source):
+        """Move a project's current_amount by a contribution's amount with one F() UPDATE of that column."""
+        if contribution_type == 'PROJECTS' and project_id:
+            self.filter(pk=project_id).update(current_amount=F('current_amount') + sign * amount)
+
+    def with_stats(self):
+        """Annotate supporter count and progress in SQL so listing N projects stays one query."""
+        return self.annotate(
+            annotated_supporter_count=Count('contribution', filter=Q(contribution__contribution_type='PROJECTS')),
+            annotated_progress_percentage=Case(
+                When(
+                    target_amount__gt=0,
+                    # Cast first: whole-number decimals divide as integers on SQLite
+                    then=Round(Cast('current_amount', models.FloatField()) * 100 / F('target_amount'), 1),
+                ),
+                default=Value(Decimal(0)),
+                output_field=models.DecimalField(max_digits=7, decimal_places=1),
+            ),
+        )
+
+class Project(ResponsiveImageModel):
     STATUS_CHOICES = [
         ('UPCOMING', 'Coming Soon'),
         ('ONGOING', 'Ongoing'),
@@ -134,14 +418,20 @@ class Project(models.Model):
     def __str__(self):
         return self.title
 
+    objects = ProjectQuerySet.as_manager()
+
     @property
     def progress_percentage(self):
+        if hasattr(self, 'annotated_progress_percentage'):
+            return round(self.annotated_progress_percentage, 1)
         if self.target_amount > 0:
             return round((self.current_amount / self.target_amount) * 100, 1)
         return 0
 
     @property
     def supporter_count(self):
+        if hasattr(self, 'annotated_supporter_count'):
+            return self.annotated_supporter_count
         return Contribution.objects.filter(
             contribution_type='PROJECTS',
             project=self
@@ -149,6 +439,10 @@ class Project(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # ProjectListView and the donation form: is_active=True newest first
+            models.Index(fields=['created_at'], condition=models.Q(is_active=True), name='project_active_idx'),
+        ]
 
 class ZakahNisab(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -159,13 +453,77 @@ class ZakahNisab(models.Model):
     class Meta:
         verbose_name = 'Zakah Nisab'
         verbose_name_plural = 'Zakah Nisab'
+        constraints = [
+            # At most one active row, even when two admins save at once
+            models.UniqueConstraint(
+                fields=['is_active'], condition=models.Q(is_active=True), name='single_active_zakah_nisab'
+            ),
+        ]
+        # The active row (get_active_nisab) is found through the partial
+        # unique index single_active_zakah_nisab creates
 
     def save(self, *args, **kwargs):
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    previous = None
+                    if self.pk is not None:
+                        previous = ZakahNisab.objects.filter(pk=self.pk).values('is_active', 'amount', 'currency').first()
+                    if self.is_active:
+                        # Only the previously active row is touched, never the whole table
+                        ZakahNisab.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
+                    super().save(*args, **kwargs)
+                    self.record_period(previous)
+                    return
+            except IntegrityError:
+                # A concurrent activation committed between our UPDATE and INSERT;
+                # the second attempt sees and deactivates that row instead.
+                if attempt:
+                    raise
+
+    def record_period(self, previous):
+        """Append to the history when the nisab in force changes because of this save."""
+        amount = self._meta.get_field('amount').to_python(self.amount)
+        was_active = previous is not None and previous['is_active']
         if self.is_active:
-            # Set all other records to inactive
-            ZakahNisab.objects.all().update(is_active=False)
-            self.is_active = True
-        super().save(*args, **kwargs)
+            if was_active and (previous['amount'], previous['currency']) == (amount, self.currency):
+                return
+            ZakahNisabPeriod.objects.create(nisab=self, amount=amount, currency=self.currency)
+        elif was_active:
+            # Deactivated without a replacement: no nisab in force from now on
+            ZakahNisabPeriod.objects.create(nisab=self, amount=None, currency=self.currency)
 
     def __str__(self):
         return f"{self.currency} {self.amount:,.2f} (Updated: {self.last_updated.strftime('%Y-%m-%d')})"
+
+
+class ZakahNisabPeriodManager(models.Manager):
+    def effective_at(self, when):
+        """Return the period (amount and currency) in force at `when`, or None."""
+        period = self.filter(effective_from__lte=when).order_by('-effective_from', '-id').first()
+        return period if period and period.amount is not None else None
+
+class ZakahNisabPeriod(models.Model):
+    """
+    Append-only history of the nisab in force: a row per activation or change
+    of the active amount, so past lookups aren't affected by later edits. An
+    empty amount means no nisab was in force from effective_from on.
+    """
+    nisab = models.ForeignKey(ZakahNisab, on_delete=models.SET_NULL, null=True, blank=True, related_name='periods')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    currency = models.CharField(max_length=10)
+    effective_from = models.DateTimeField(default=timezone.now)
+
+    objects = ZakahNisabPeriodManager()
+
+    class Meta:
+        verbose_name = 'Zakah Nisab period'
+        indexes = [
+            # ZakahNisabPeriod.objects.effective_at()
+            models.Index(fields=['effective_from', 'id'], name='zakahnisabperiod_effective_idx'),
+        ]
+
+    def __str__(self):
+        if self.amount is None:
+            return f"No nisab from {self.effective_from:%Y-%m-%d}"
+        return f"{self.currency} {self.amount:,.2f} from {self.effective_from:%Y-%m-%d}"
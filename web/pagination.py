@@ -0,0 +1,86 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.http import Http404
+
+
+def encode_cursor(values):
+    # isoformat() keeps full microsecond precision, which DjangoJSONEncoder would truncate
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset, ordered newest first by (field, id)."""
+
+    def __init__(self, object_list, next_cursor, cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor is not None
+
+
+def keyset_page(queryset, cursor, page_size, field):
+    """
+    Return the page of `queryset` that follows `cursor`, ordered by (-field, -id).
+
+    Seeking past the last seen (field, id) instead of using OFFSET keeps every
+    page as cheap as the first one when (field, id) is indexed.
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+    if cursor:
+        # Cursors come from the client: anything that doesn't decode to a
+        # (value, id) pair of the right types is a 404, never a 500
+        try:
+            value, last_id = decode_cursor(cursor)
+            value = queryset.model._meta.get_field(field).to_python(value)
+            if value is None or type(last_id) is not int:
+                raise ValueError(cursor)
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': last_id}))
+        except Exception:
+            raise Http404('Invalid cursor')
+
+    object_list = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(object_list) > page_size:
+        object_list = object_list[:page_size]
+        last = object_list[-1]
+        next_cursor = encode_cursor([getattr(last, field), last.id])
+    return KeysetPage(object_list, next_cursor, cursor)
+
+
+class KeysetPaginationMixin:
+    """Swap a ListView's OFFSET pagination for keyset pagination driven by ?cursor=."""
+
+    keyset_field = None
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_page(queryset, self.request.GET.get(self.cursor_kwarg), page_size, self.keyset_field)
+        return None, page, page.object_list, page.has_next or page.has_previous
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Query string of the current filters, for building next/first page links
+        params = self.request.GET.copy()
+        params.pop(self.cursor_kwarg, None)
+        context['filter_query'] = params.urlencode()
+        return context
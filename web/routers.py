@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Set while a ReadReplicaMixin view handles a request
+reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+@contextmanager
+def use_read_replica():
+    token = reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        reading_from_replica.reset(token)
+
+
+class ReadReplicaMixin:
+    """Read the web app's tables from settings.READ_REPLICA while this view runs."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with use_read_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            # Template responses are otherwise rendered after dispatch returns,
+            # and queries made from the template would go to default
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+
+
+class ReadReplicaRouter:
+    """
+    Writes always go to default. Reads go to the replica only inside
+    use_read_replica() and only for the web app's models, so sessions and
+    users are never read from a replica that may lag behind a login.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.READ_REPLICA and reading_from_replica.get() and model._meta.app_label == 'web':
+            return settings.READ_REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for instances that were read from the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        aliases = {DEFAULT_DB_ALIAS, settings.READ_REPLICA}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas (the aliases that mirror another in tests) get their schema
+        # from the primary
+        if settings.DATABASES[db].get('TEST', {}).get('MIRROR'):
+            return False
+        return None
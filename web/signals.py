@@ -0,0 +1,73 @@
+import logging
+
+from django.db.models import Min
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .caching import bump_version
+from .models import Activity, Contribution, ContributionRollup, District, Gallery, Project, ZakahNisab, ZakahNisabPeriod
+
+logger = logging.getLogger(__name__)
+
+# Cache groups (see web.caching) that must be invalidated when each model changes
+CACHE_GROUPS = {
+    # Counters, statistics and project progress/supporters
+    Contribution: ('contributions', 'projects'),
+    District: ('contributions', 'districts'),
+    # 'project_choices' is only the donation form's project list
+    Project: ('projects', 'project_choices'),
+    Gallery: ('gallery',),
+    Activity: ('activities',),
+    ZakahNisab: ('nisab',),
+}
+
+
+@receiver(post_delete, sender=Contribution)
+def remove_contribution_from_totals(sender, instance, **kwargs):
+    source = instance.rollup_source()
+    ContributionRollup.objects.remove(**source)
+    Project.objects.add_contribution(**source, sign=-1)
+
+
+@receiver(pre_delete, sender=District)
+@receiver(pre_delete, sender=Project)
+def remember_first_rollup_date(sender, instance, **kwargs):
+    instance._first_rollup_date = instance.rollups.aggregate(first=Min('date'))['first']
+
+
+@receiver(post_delete, sender=District)
+@receiver(post_delete, sender=Project)
+def rebuild_rollups_after_delete(sender, instance, **kwargs):
+    # The deleted row's rollups were cascaded away while its contributions
+    # were only detached (SET_NULL), so regroup them from that date on.
+    if instance._first_rollup_date:
+        ContributionRollup.objects.rebuild(since=instance._first_rollup_date)
+
+
+@receiver(post_delete, sender=ZakahNisab)
+def end_deleted_nisab_period(sender, instance, **kwargs):
+    # Here rather than in delete() so queryset (admin bulk) deletes are covered
+    if instance.is_active:
+        ZakahNisabPeriod.objects.create(amount=None, currency=instance.currency)
+
+
+@receiver(post_save, sender=Gallery)
+@receiver(post_save, sender=Project)
+def generate_image_variants(sender, instance, **kwargs):
+    if not instance.image_needs_variants():
+        return
+    try:
+        instance.generate_image_variants()
+    except OSError:
+        # Unreadable or missing file: pages keep serving the original, and
+        # generate_image_variants can be re-run once it is fixed
+        logger.warning('Could not make image variants for %s %s', sender.__name__, instance.pk, exc_info=True)
+
+
+def invalidate_cached_pages(sender, **kwargs):
+    bump_version(*CACHE_GROUPS[sender])
+
+
+for model in CACHE_GROUPS:
+    post_save.connect(invalidate_cached_pages, sender=model)
+    post_delete.connect(invalidate_cached_pages, sender=model)
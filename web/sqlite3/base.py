@@ -0,0 +1,41 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    The stock SQLite backend plus two OPTIONS that Django only gains in 5.1,
+    under the same names so the ENGINE can be switched back after upgrading:
+
+    - init_command: ';'-separated statements (e.g. PRAGMAs) run on every new
+      connection
+    - transaction_mode: how transaction.atomic() begins; IMMEDIATE takes the
+      write lock up front, so a writer waits out busy_timeout at BEGIN instead
+      of failing with "database is locked" when it first writes
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Not sqlite3.connect() arguments
+        kwargs.pop('init_command', None)
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES['{self.alias}']['OPTIONS']['transaction_mode'] must be one of "
+                f"{', '.join(TRANSACTION_MODES)}."
+            )
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        init_command = self.settings_dict['OPTIONS'].get('init_command')
+        for statement in (init_command or '').split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        transaction_mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {transaction_mode.upper()}' if transaction_mode else 'BEGIN')
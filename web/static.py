@@ -0,0 +1,105 @@
+import mimetypes
+import os
+from email.utils import formatdate
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.functional import cached_property
+
+# Hashed names change whenever the content does, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unhashed names (e.g. a URL someone bookmarked) can change under the same name
+SHORT_CACHE_CONTROL = 'public, max-age=60'
+
+# Best first; the sibling file's extension for each Content-Encoding
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CHUNK_SIZE = 64 * 1024
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CompressedStaticFiles:
+    """
+    WSGI wrapper serving collected static files straight from STATIC_ROOT,
+    picking the .br or .gz copy written by collectstatic when the client
+    accepts it. Anything it can't find is passed on to the Django application.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = os.path.realpath(root or settings.STATIC_ROOT)
+        self.prefix = prefix or urlparse(settings.STATIC_URL).path
+
+    def __call__(self, environ, start_response):
+        path = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD') and path.startswith(self.prefix):
+            response = self.serve(environ, start_response, path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.application(environ, start_response)
+
+    def find(self, name):
+        if name.endswith(tuple(extension for _, extension in ENCODINGS)):
+            # Compressed copies are only sent with a Content-Encoding header
+            return None
+        path = os.path.realpath(os.path.join(self.root, name))
+        # Refuse anything that resolves outside STATIC_ROOT, e.g. via '..'
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def serve(self, environ, start_response, name):
+        path = self.find(name)
+        if path is None:
+            return None
+
+        content_type, _ = mimetypes.guess_type(name)
+        headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Vary', 'Accept-Encoding'),
+            ('Cache-Control', IMMUTABLE_CACHE_CONTROL if self.is_hashed(name) else SHORT_CACHE_CONTROL),
+        ]
+        accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        for encoding, extension in ENCODINGS:
+            if encoding in accepted and os.path.isfile(path + extension):
+                path += extension
+                headers.append(('Content-Encoding', encoding))
+                break
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers += [('ETag', etag), ('Last-Modified', formatdate(stat.st_mtime, usegmt=True))]
+        if etag in environ.get('HTTP_IF_NONE_MATCH', ''):
+            start_response('304 Not Modified', headers)
+            return []
+
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file = open(path, 'rb')
+        if 'wsgi.file_wrapper' in environ:
+            return environ['wsgi.file_wrapper'](file, CHUNK_SIZE)
+        return self.read(file)
+
+    def read(self, file):
+        with file:
+            while chunk := file.read(CHUNK_SIZE):
+                yield chunk
+
+    def is_hashed(self, name):
+        return name in self.hashed_names
+
+    @cached_property
+    def hashed_names(self):
+        # From the manifest collectstatic wrote; a new one takes a restart, like new code
+        return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
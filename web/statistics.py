@@ -0,0 +1,93 @@
+import calendar
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Contribution, ContributionRollup, District
+
+# All figures are read from the daily ContributionRollup table, so their cost
+# grows with the number of days that have donations rather than with donations.
+
+
+def percentage_of(amount, total):
+    return round(amount / total * 100, 1) if total > 0 else 0
+
+
+def contribution_totals(rollups=None):
+    """Total number and amount of contributions, in one query."""
+    rollups = ContributionRollup.objects.all() if rollups is None else rollups
+    totals = rollups.aggregate(count=Sum('count'), amount=Sum('total_amount'))
+    return totals['count'] or 0, totals['amount'] or 0
+
+
+def type_breakdown(total_amount, rollups=None):
+    """Count, amount and share of the total for every contribution type, in one query."""
+    rollups = ContributionRollup.objects.all() if rollups is None else rollups
+    rows = {
+        row['contribution_type']: row
+        for row in rollups.order_by().values('contribution_type').annotate(
+            contribution_count=Sum('count'), amount=Sum('total_amount')
+        )
+    }
+    breakdown = []
+    for type_code, type_name in Contribution.CONTRIBUTION_TYPES:
+        row = rows.get(type_code, {})
+        amount = row.get('amount') or 0
+        breakdown.append({
+            'type': type_name,
+            'count': row.get('contribution_count') or 0,
+            'amount': amount,
+            'percentage': percentage_of(amount, total_amount),
+        })
+    return breakdown
+
+
+def monthly_series(year, rollups=None):
+    """Amount contributed in each month of `year`, in one query."""
+    rollups = ContributionRollup.objects.all() if rollups is None else rollups
+    amounts = {
+        row['month'].month: row['amount']
+        for row in rollups.filter(date__year=year)
+        .annotate(month=TruncMonth('date'))
+        .order_by()
+        .values('month')
+        .annotate(amount=Sum('total_amount'))
+    }
+    year_total = sum(amounts.values())
+    return [
+        {
+            'month': calendar.month_abbr[month],
+            'amount': amounts.get(month, 0),
+            'percentage': percentage_of(amounts.get(month, 0), year_total),
+        }
+        for month in range(1, 13)
+    ]
+
+
+def district_totals():
+    """Contributor count and amount for every district, in one query."""
+    districts = District.objects.annotate(
+        contributors_count=Coalesce(Sum('rollups__count'), 0),
+        contributions_amount=Sum('rollups__total_amount'),
+    )
+    return [
+        {
+            'district': district,
+            'total_amount': district.contributions_amount or 0,
+            'contributors_count': district.contributors_count,
+        }
+        for district in districts
+    ]
+
+
+def overall_statistics(year):
+    """Context for the statistics page; always four queries regardless of data volume."""
+    total_contributions, total_amount = contribution_totals()
+    return {
+        'total_contributions': total_contributions,
+        'total_amount': total_amount,
+        'type_breakdown': type_breakdown(total_amount),
+        'monthly_data': monthly_series(year),
+        'current_year': year,
+        'district_data': district_totals(),
+    }
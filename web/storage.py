@@ -0,0 +1,105 @@
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Text formats worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map')
+
+# Smaller files can come out larger once compressed
+COMPRESS_MIN_SIZE = 256
+
+
+# Quoted strings and unquoted url() values, which must come through as
+# written, and comments, which are dropped. Matched in one pass so a '/*'
+# inside a string isn't taken for a comment, nor a quote inside a comment
+# for a string.
+CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)'"]*\)|/\*.*?\*/)''', re.S)
+
+
+def minify_css(css):
+    preserved = []
+
+    def set_aside(match):
+        if match.group().startswith('/*'):
+            return ''
+        preserved.append(match.group())
+        return f'\0{len(preserved) - 1}\0'
+
+    css = CSS_TOKENS.sub(set_aside, css)
+    css = re.sub(r'\s+', ' ', css)
+    # Only around braces, semicolons and commas and after colons: a space
+    # before ':' can be a descendant selector and one around '+' or '-' is
+    # needed inside calc()
+    css = re.sub(r' ?([{};,]) ?', r'\1', css).replace(': ', ':')
+    css = css.replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda match: preserved[int(match.group(1))], css)
+
+
+# JS is left as written: stripping it safely needs a real lexer (template
+# literals, regex literals, strings spanning lines); gzip and brotli recover
+# most of what a minifier would save
+MINIFIERS = {'.css': minify_css}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Minifies CSS, names every file after a hash of its contents and
+    writes .gz (and .br, with the brotli package installed) copies of text
+    files next to the original and the hashed name during collectstatic.
+    """
+
+    def stored_name(self, name):
+        # Before collectstatic has written a manifest (tests, a fresh checkout
+        # with DEBUG off) fall back to the unhashed name instead of failing
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+
+        # STATICFILES_DIRS entries are paths or (prefix, path) pairs
+        own = {
+            os.path.realpath(root[1] if isinstance(root, (list, tuple)) else root)
+            for root in settings.STATICFILES_DIRS
+        }
+        for name, (storage, _) in list(paths.items()):
+            minify = MINIFIERS.get(os.path.splitext(name)[1])
+            # Only the project's own sources; apps' files (the admin's) ship as written
+            if minify and os.path.realpath(getattr(storage, 'location', '')) in own:
+                with self.open(name) as original:
+                    minified = minify(original.read().decode())
+                self.delete(name)
+                self._save(name, ContentFile(minified.encode()))
+                # Hash the minified copy collected here, not the source file
+                paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        for name, hashed_name in self.hashed_files.items():
+            for path in {name, hashed_name}:
+                if path.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(path):
+                    self.compress(path)
+
+    def compress(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for extension, compressed in variants:
+            if len(compressed) < len(content):
+                self.delete(name + extension)
+                self._save(name + extension, ContentFile(compressed))
@@ -1,3 +1,1293 @@
-from django.test import TestCase
+import gzip
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.models import F, Q
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import caching, statistics, views
+from .instrumentation import QueryBudgetExceeded, metrics
+from .management.commands import benchmark
+from .exports import safe_cell
+from .forms import ContributionForm, DashboardFilterForm
+from .static import CompressedStaticFiles
+from .storage import minify_css
+from .pagination import encode_cursor
+from .models import Activity, Contribution, ContributionCounter, ContributionRollup, District, Gallery, Project, ReceiptSequence, ZakahNisab, ZakahNisabPeriod
+
+
+def setUpModule():
+    # Every request logs its metrics at INFO; keep them out of the test output
+    logging.getLogger('web.metrics').setLevel(logging.WARNING)
+
+
+@override_settings(QUERY_BUDGETS_ENFORCE=True)
+class WebTestCase(TestCase):
+    def setUp(self):
+        # Cached pages and versions live outside the test transaction
+        cache.clear()
+        super().setUp()
+
+
+def contribution_data(**overrides):
+    data = {
+        'first_name': 'Amina',
+        'last_name': 'Nakato',
+        'phone_number': '0700000000',
+        'amount': '10000',
+    }
+    data.update(overrides)
+    return data
+
+
+class ReceiptSequenceTests(WebTestCase):
+    def test_allocate_is_per_prefix_and_day(self):
+        today = date(2025, 3, 1)
+        self.assertEqual(ReceiptSequence.objects.allocate('ZAK', today), 1)
+        self.assertEqual(ReceiptSequence.objects.allocate('ZAK', today), 2)
+        self.assertEqual(ReceiptSequence.objects.allocate('SAD', today), 1)
+        self.assertEqual(ReceiptSequence.objects.allocate('ZAK', date(2025, 3, 2)), 1)
+
+    def test_allocate_block_returns_first_number(self):
+        today = date(2025, 3, 1)
+        self.assertEqual(ReceiptSequence.objects.allocate('ZAK', today, count=10), 1)
+        self.assertEqual(ReceiptSequence.objects.allocate('ZAK', today), 11)
+
+    def test_save_assigns_receipt_number(self):
+        contribution = Contribution.objects.create(contribution_type='SADAQA', **contribution_data())
+        day = contribution.date_contributed.date()
+        self.assertEqual(contribution.receipt_number, f'SAD{day:%y%m%d}0001')
+
+
+class ContributionCounterTests(WebTestCase):
+    def test_increment_sums_across_shards(self):
+        for _ in range(20):
+            ContributionCounter.objects.increment('ZAKAH', Decimal('50.00'))
+        ContributionCounter.objects.increment('SADAQA', Decimal('10.00'))
+
+        zakah = ContributionCounter.objects.total_for('ZAKAH')
+        self.assertEqual((zakah.count, zakah.total_amount), (20, Decimal('1000.00')))
+        totals = {counter.contribution_type: counter.count for counter in ContributionCounter.objects.totals()}
+        self.assertEqual(totals, {'ZAKAH': 20, 'SADAQA': 1})
+
+    def test_total_for_unknown_type_is_zero(self):
+        counter = ContributionCounter.objects.total_for('FITRA')
+        self.assertEqual((counter.count, counter.total_amount), (0, 0))
+
+    def test_reconcile_counters_repairs_drift(self):
+        Contribution.objects.create(contribution_type='ZAKAH', **contribution_data(amount='300'))
+        Contribution.objects.create(contribution_type='ZAKAH', **contribution_data(amount='200'))
+        ContributionCounter.objects.create(contribution_type='ZAKAH', shard=3, count=5, total_amount=900)
+
+        call_command('reconcile_counters', '--dry-run', stdout=StringIO())
+        self.assertEqual(ContributionCounter.objects.total_for('ZAKAH').count, 5)
+
+        call_command('reconcile_counters', stdout=StringIO())
+        zakah = ContributionCounter.objects.total_for('ZAKAH')
+        self.assertEqual((zakah.count, zakah.total_amount), (2, Decimal('500.00')))
+
+
+class ContributionRollupTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kampala = District.objects.create(name='Kampala', date_created=timezone.now())
+        self.jinja = District.objects.create(name='Jinja', date_created=timezone.now())
+
+    def rollups(self):
+        return sorted(ContributionRollup.objects.values_list('district__name', 'count', 'total_amount'))
+
+    def test_save_edit_and_delete_keep_rollups_current(self):
+        first = Contribution.objects.create(contribution_type='ZAKAH', district=self.kampala, **contribution_data(amount='100'))
+        Contribution.objects.create(contribution_type='ZAKAH', district=self.kampala, **contribution_data(amount='50'))
+        self.assertEqual(self.rollups(), [('Kampala', 2, Decimal('150.00'))])
+
+        first.district = self.jinja
+        first.save()
+        self.assertEqual(self.rollups(), [('Jinja', 1, Decimal('100.00')), ('Kampala', 1, Decimal('50.00'))])
+
+        first.delete()
+        self.assertEqual(self.rollups(), [('Jinja', 0, Decimal('0.00')), ('Kampala', 1, Decimal('50.00'))])
+
+    def test_deleting_district_moves_its_rollups_to_no_district(self):
+        Contribution.objects.create(contribution_type='ZAKAH', district=self.kampala, **contribution_data(amount='100'))
+        self.kampala.delete()
+        self.assertEqual(self.rollups(), [(None, 1, Decimal('100.00'))])
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for amount in ('100', '200', '300'):
+            Contribution.objects.create(contribution_type='SADAQA', district=self.jinja, **contribution_data(amount=amount))
+        incremental = self.rollups()
+        ContributionRollup.objects.update(count=0, total_amount=0)
+
+        call_command('rebuild_rollups', '--since', timezone.localdate().isoformat(), stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+
+class ActiveNisabCacheTests(WebTestCase):
+    def create_nisab(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ZakahNisab.objects.create(amount=amount)
+
+    def test_warm_cache_costs_no_queries(self):
+        self.create_nisab(Decimal('5000000'))
+        caching.get_active_nisab()
+        with self.assertNumQueries(0):
+            self.assertEqual(caching.get_active_nisab().amount, Decimal('5000000'))
+
+    def test_saving_a_nisab_is_seen_immediately(self):
+        self.create_nisab(Decimal('5000000'))
+        caching.get_active_nisab()
+        self.create_nisab(Decimal('6000000'))
+        self.assertEqual(caching.get_active_nisab().amount, Decimal('6000000'))
+
+    def test_other_workers_pick_up_the_shared_value(self):
+        self.create_nisab(Decimal('5000000'))
+        caching.get_active_nisab()
+        # A fresh process starts with an empty local copy
+        caching._local_nisab.update(version=None, value=None)
+        with self.assertNumQueries(0):
+            self.assertEqual(caching.get_active_nisab().amount, Decimal('5000000'))
+
+    def test_deleting_the_active_nisab_clears_it(self):
+        nisab = self.create_nisab(Decimal('5000000'))
+        caching.get_active_nisab()
+        with self.captureOnCommitCallbacks(execute=True):
+            nisab.delete()
+        self.assertIsNone(caching.get_active_nisab())
+
+
+class ZakahNisabActivationTests(WebTestCase):
+    def test_activating_switches_the_single_active_row(self):
+        old = ZakahNisab.objects.create(amount=Decimal('5000000'))
+        new = ZakahNisab.objects.create(amount=Decimal('6000000'))
+        self.assertEqual(list(ZakahNisab.objects.filter(is_active=True)), [new])
+        old.refresh_from_db()
+        self.assertFalse(old.is_active)
+
+    def test_editing_the_active_row_touches_no_other_row(self):
+        nisab = ZakahNisab.objects.create(amount=Decimal('5000000'))
+        nisab.amount = Decimal('5500000')
+        with CaptureQueriesContext(connection) as queries:
+            nisab.save()
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertIn('"is_active" AND NOT', updates[0])
+
+    def test_saving_without_changes_adds_no_history(self):
+        nisab = ZakahNisab.objects.create(amount=Decimal('5000000'))
+        nisab.save()
+        self.assertEqual(nisab.periods.count(), 1)
+
+    def test_database_rejects_a_second_active_row(self):
+        ZakahNisab.objects.create(amount=Decimal('5000000'))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ZakahNisab.objects.bulk_create([ZakahNisab(amount=Decimal('6000000'), is_active=True)])
+
+    def backdate(self, days):
+        # Move every period recorded so far `days` further into the past
+        ZakahNisabPeriod.objects.update(effective_from=F('effective_from') - timedelta(days=days))
+
+    def amount_at(self, days_ago):
+        period = ZakahNisabPeriod.objects.effective_at(timezone.now() - timedelta(days=days_ago))
+        return period and period.amount
+
+    def test_effective_at_returns_historic_value(self):
+        ZakahNisab.objects.create(amount=Decimal('5000000'))
+        self.backdate(30)
+        ZakahNisab.objects.create(amount=Decimal('6000000'))
+
+        self.assertEqual(self.amount_at(10), Decimal('5000000'))
+        self.assertEqual(self.amount_at(0), Decimal('6000000'))
+        self.assertIsNone(self.amount_at(60))
+
+    def test_reactivating_an_old_row_keeps_the_period_it_covered(self):
+        old = ZakahNisab.objects.create(amount=Decimal('100'))
+        self.backdate(90)
+        ZakahNisab.objects.create(amount=Decimal('200'))
+        self.backdate(30)
+        old.is_active = True
+        old.save()
+
+        self.assertEqual(self.amount_at(75), Decimal('100'))
+        self.assertEqual(self.amount_at(10), Decimal('200'))
+        self.assertEqual(self.amount_at(0), Decimal('100'))
+
+    def test_editing_the_amount_leaves_past_lookups_alone(self):
+        nisab = ZakahNisab.objects.create(amount=Decimal('5000000'))
+        self.backdate(30)
+        nisab.amount = Decimal('5500000')
+        nisab.save()
+
+        self.assertEqual(self.amount_at(10), Decimal('5000000'))
+        self.assertEqual(self.amount_at(0), Decimal('5500000'))
+
+    def test_deactivating_or_deleting_ends_the_period(self):
+        nisab = ZakahNisab.objects.create(amount=Decimal('5000000'))
+        self.backdate(30)
+        nisab.is_active = False
+        nisab.save()
+        self.assertIsNone(self.amount_at(0))
+        self.assertEqual(self.amount_at(10), Decimal('5000000'))
+
+        other = ZakahNisab.objects.create(amount=Decimal('6000000'))
+        self.backdate(5)
+        other.delete()
+        self.assertIsNone(self.amount_at(0))
+        self.assertEqual(self.amount_at(3), Decimal('6000000'))
+
+    def test_zakah_receipt_shows_the_nisab_at_payment(self):
+        ZakahNisab.objects.create(amount=Decimal('5000000'))
+        self.backdate(30)
+        contribution = Contribution.objects.create(contribution_type='ZAKAH', **contribution_data())
+        Contribution.objects.filter(pk=contribution.pk).update(date_contributed=timezone.now() - timedelta(days=10))
+        ZakahNisab.objects.create(amount=Decimal('6000000'))
+
+        response = self.client.get(reverse('web:receipt', args=[contribution.pk]))
+        self.assertContains(response, 'Nisab at Payment:</strong> KES 5,000,000')
+
+
+class ProjectStatsTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        caching.get_active_nisab()
+
+    def create_projects(self, count):
+        for index in range(count):
+            project = Project.objects.create(title=f'Borehole {index}', description='Water', target_amount=1000 * (index + 1))
+            Project.objects.filter(pk=project.pk).update(current_amount=250)
+            Contribution.objects.bulk_create(
+                Contribution(contribution_type='PROJECTS', project=project, receipt_number=f'PRO{project.pk:03d}{n}', **contribution_data())
+                for n in range(index + 1)
+            )
+
+    def test_with_stats_matches_python_properties(self):
+        self.create_projects(3)
+        Project.objects.create(title='Unfunded', description='No target', target_amount=0)
+        for project in Project.objects.with_stats():
+            plain = Project.objects.get(pk=project.pk)
+            self.assertEqual(project.supporter_count, plain.supporter_count)
+            self.assertEqual(project.progress_percentage, plain.progress_percentage)
+
+    def test_project_list_costs_constant_queries(self):
+        self.create_projects(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('web:projects'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_projects(6)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('web:projects'))
+        self.assertEqual(len(few), len(many))
+        self.assertContains(response, '25.0%')
+
+    def test_admin_changelist_costs_constant_queries(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        self.create_projects(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('admin:web_project_changelist'))
+        self.create_projects(6)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse('admin:web_project_changelist'))
+        self.assertEqual(len(few), len(many))
+
+
+class ProjectTotalTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(title='Mosque roof', description='Roofing', target_amount=100000)
+
+    def current_amount(self):
+        return Project.objects.values_list('current_amount', flat=True).get(pk=self.project.pk)
+
+    def test_contributions_move_current_amount_without_rewriting_the_row(self):
+        updated_at = self.project.updated_at
+        with CaptureQueriesContext(connection) as queries:
+            contribution = Contribution.objects.create(
+                contribution_type='PROJECTS', project=self.project, **contribution_data(amount='3000')
+            )
+        project_updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "web_project"')]
+        self.assertEqual(len(project_updates), 1)
+        self.assertIn('SET "current_amount" = (', project_updates[0])
+        self.assertNotIn('updated_at', project_updates[0])
+        self.assertEqual(self.current_amount(), 3000)
+        self.assertEqual(Project.objects.get(pk=self.project.pk).updated_at, updated_at)
+
+        contribution.amount = Decimal('5000')
+        contribution.save()
+        self.assertEqual(self.current_amount(), 5000)
+
+        contribution.first_name = 'Halima'
+        contribution.save()
+        self.assertEqual(self.current_amount(), 5000)
+
+        contribution.delete()
+        self.assertEqual(self.current_amount(), 0)
+
+    def test_reconcile_project_totals_repairs_drift(self):
+        Contribution.objects.create(contribution_type='PROJECTS', project=self.project, **contribution_data(amount='3000'))
+        Project.objects.filter(pk=self.project.pk).update(current_amount=999)
+
+        output = StringIO()
+        call_command('reconcile_project_totals', '--dry-run', stdout=output)
+        self.assertIn('Mosque roof: 999 -> 3000', output.getvalue())
+        self.assertEqual(self.current_amount(), 999)
+
+        call_command('reconcile_project_totals', stdout=StringIO())
+        self.assertEqual(self.current_amount(), 3000)
+
+
+class OverallStatisticsTests(WebTestCase):
+    def create_contributions(self, districts, months):
+        year = timezone.now().year
+        for index in range(districts):
+            district = District.objects.create(name=f'District {index}', date_created=timezone.now())
+            for month in range(1, months + 1):
+                contribution = Contribution.objects.create(
+                    contribution_type='ZAKAH' if month % 2 else 'SADAQA', district=district, **contribution_data()
+                )
+                Contribution.objects.filter(pk=contribution.pk).update(
+                    date_contributed=timezone.now().replace(year=year, month=month, day=15)
+                )
+        # Backdating with update() bypasses save(), so regroup the rollups
+        call_command('rebuild_rollups', stdout=StringIO())
+
+    def test_statistics_use_constant_number_of_queries(self):
+        year = timezone.now().year
+        self.create_contributions(districts=2, months=2)
+        with self.assertNumQueries(4):
+            small = statistics.overall_statistics(year)
+
+        self.create_contributions(districts=10, months=12)
+        with self.assertNumQueries(4):
+            large = statistics.overall_statistics(year)
+
+        self.assertEqual(len(small['district_data']), 2)
+        self.assertEqual(len(large['district_data']), 12)
+
+    def test_statistics_values(self):
+        self.create_contributions(districts=2, months=3)
+        stats = self.client.get(reverse('web:overall_contributions')).context['stats']
+
+        self.assertEqual(stats['total_contributions'], 6)
+        self.assertEqual(stats['total_amount'], 60000)
+        breakdown = {row['type']: (row['count'], row['amount']) for row in stats['type_breakdown']}
+        self.assertEqual(breakdown['Zakah'], (4, 40000))
+        self.assertEqual(breakdown['Sadaqa'], (2, 20000))
+        self.assertEqual([month['amount'] for month in stats['monthly_data'][:4]], [20000, 20000, 20000, 0])
+        self.assertEqual(
+            [(row['contributors_count'], row['total_amount']) for row in stats['district_data']],
+            [(3, 30000), (3, 30000)],
+        )
+
+
+class DistrictContributionsViewTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        self.district = District.objects.create(name='Kampala', date_created=timezone.now())
+        Contribution.objects.bulk_create(
+            Contribution(contribution_type='ZAKAH', district=self.district, receipt_number=f'ZAK0000000{index:03d}', **contribution_data())
+            for index in range(30)
+        )
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.url = reverse('web:district_contributions', args=[self.district.id])
+
+    def test_requires_login(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_contributions_are_paginated(self):
+        self.client.force_login(User.objects.create_user('finance'))
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(len(response.context['contributions']), 5)
+        self.assertEqual(response.context['paginator'].count, 30)
+
+    def test_statistics_context_holds_no_querysets(self):
+        response = self.client.get(reverse('web:overall_contributions'))
+        self.assertEqual(
+            response.context['stats']['district_data'],
+            [{'district': self.district, 'total_amount': 300000, 'contributors_count': 30}],
+        )
+
+
+class DashboardViewTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        self.district = District.objects.create(name='Kampala', date_created=timezone.now())
+        Contribution.objects.bulk_create(
+            Contribution(
+                contribution_type='ZAKAH' if index % 3 else 'SADAQA',
+                district=self.district if index % 2 else None,
+                receipt_number=f'DSH{index:05d}',
+                **contribution_data(),
+            )
+            for index in range(120)
+        )
+        self.client.force_login(User.objects.create_user('finance'))
+
+    def walk_pages(self, params=None):
+        params = dict(params or {})
+        receipts, query_counts = [], []
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('web:dashboard'), params)
+            query_counts.append(len(queries))
+            receipts += [contribution.receipt_number for contribution in response.context['contributions']]
+            if not response.context['page_obj'].has_next:
+                return receipts, query_counts
+            params['cursor'] = response.context['page_obj'].next_cursor
+
+    def test_keyset_pages_cover_every_row_once_at_constant_cost(self):
+        # Fill the statistics and choice caches first so only paging varies
+        self.client.get(reverse('web:dashboard'))
+        receipts, query_counts = self.walk_pages()
+        self.assertEqual(sorted(receipts), sorted(Contribution.objects.values_list('receipt_number', flat=True)))
+        self.assertEqual(len(query_counts), 3)
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_filters_apply_across_pages(self):
+        receipts, _ = self.walk_pages({'contribution_type': 'ZAKAH', 'district': self.district.id})
+        expected = Contribution.objects.filter(contribution_type='ZAKAH', district=self.district)
+        self.assertEqual(sorted(receipts), sorted(expected.values_list('receipt_number', flat=True)))
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('web:dashboard'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_well_formed_cursor_with_bad_contents_is_not_found(self):
+        for values in ([None, 1], [timezone.now(), 'x'], [timezone.now(), None], [timezone.now(), 1.5], ['x', 1], [1]):
+            with self.subTest(values=values):
+                response = self.client.get(reverse('web:dashboard'), {'cursor': encode_cursor(values)})
+                self.assertEqual(response.status_code, 404)
+
+
+class ContributionListViewTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        Contribution.objects.bulk_create(
+            Contribution(contribution_type='SADAQA', receipt_number=f'SAD{index:05d}', **contribution_data())
+            for index in range(40)
+        )
+        Contribution.objects.create(contribution_type='ZAKAH', **contribution_data())
+        self.url = reverse('web:contribution_list', args=['SADAQA'])
+
+    def test_html_page_is_paginated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['contributions']), 25)
+        self.assertTrue(response.context['page_obj'].has_next)
+        self.assertNotContains(response, 'Amina')
+
+    def test_json_mode_streams_pages_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'format': 'json'})
+            first = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(first['results']), 25)
+        self.assertEqual(first['results'][0], {
+            'amount': '10000.00', 'district': None, 'date_contributed': timezone.localdate().isoformat(),
+        })
+
+        response = self.client.get(self.url, {'format': 'json', 'cursor': first['next_cursor']})
+        second = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(second['results']), 15)
+        self.assertIsNone(second['next_cursor'])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Plans are checked against the SQLite planner')
+class IndexPlanTests(WebTestCase):
+    """Fail if one of the hot queries stops being served by its index."""
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan, f'{queryset.query}\n{plan}')
+
+    def test_hot_queries_use_their_indexes(self):
+        newest_first = ('-date_contributed', '-id')
+        cursor_after = Q(date_contributed__lt=timezone.now()) | Q(date_contributed=timezone.now(), id__lt=10)
+        contribution_list = views.ContributionListView(kwargs={'contribution_type': 'ZAKAH'}).get_queryset()
+        dashboard_filter = DashboardFilterForm({'district': '', 'date_from': '2025-01-01'})
+        plans = [
+            (Contribution.objects.order_by(*newest_first)[:51], 'contribution_date_idx'),
+            (Contribution.objects.filter(cursor_after).order_by(*newest_first)[:51], 'contribution_date_idx'),
+            (dashboard_filter.filter(Contribution.objects.all()).order_by(*newest_first)[:51], 'contribution_date_idx'),
+            (contribution_list.order_by(*newest_first)[:26], 'contribution_type_date_idx'),
+            (Contribution.objects.filter(district=1).order_by(*newest_first)[:51], 'contribution_district_date_idx'),
+            (Contribution.objects.filter(contribution_type='PROJECTS', project=1), 'contribution_project_type_idx'),
+            (ZakahNisab.objects.filter(is_active=True)[:1], 'single_active_zakah_nisab'),
+            (ZakahNisabPeriod.objects.filter(effective_from__lte=timezone.now()).order_by('-effective_from', '-id')[:1], 'zakahnisabperiod_effective_idx'),
+            (views.ProjectListView().get_queryset(), 'project_active_idx'),
+            (views.ActivityListView().get_queryset(), 'activity_active_idx'),
+            (ContributionRollup.objects.filter(date__year=2025), 'unique_rollup_per_day_type_district_project'),
+        ]
+        for queryset, index_name in plans:
+            with self.subTest(index=index_name, query=str(queryset.query)):
+                self.assertUsesIndex(queryset, index_name)
+
+
+class PageCacheTests(WebTestCase):
+    def test_anonymous_pages_are_served_from_cache(self):
+        for name in ('home', 'gallery', 'projects', 'activities', 'overall_contributions'):
+            with self.subTest(page=name):
+                first = self.client.get(reverse(f'web:{name}'))
+                with self.assertNumQueries(0):
+                    second = self.client.get(reverse(f'web:{name}'))
+                self.assertEqual(second.status_code, 200)
+                self.assertEqual(first.content, second.content)
+
+    def test_only_parameters_the_view_reads_are_cached(self):
+        url = reverse('web:gallery')
+        self.client.get(url, {'format': 'json'})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, {'format': 'json'})['Content-Type'], 'application/json')
+        self.assertEqual(self.client.get(url)['Content-Type'], 'text/html; charset=utf-8')
+
+        # Unknown parameters are never cached, so they can't fill the cache with copies
+        self.client.get(url, {'utm_source': 'mail'})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'utm_source': 'mail'})
+        self.assertGreater(len(queries), 0)
+
+    def test_saving_a_contribution_invalidates_dependent_pages(self):
+        self.client.get(reverse('web:overall_contributions'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('web:pay_sadaqa'), contribution_data(amount='4321'))
+        response = self.client.get(reverse('web:overall_contributions'))
+        self.assertContains(response, '4,321')
+
+    def test_logged_in_users_get_fragment_caching_only(self):
+        self.client.force_login(User.objects.create_user('finance'))
+        self.client.get(reverse('web:overall_contributions'))
+        with self.assertNumQueries(2):  # session and user; the statistics fragment is cached
+            response = self.client.get(reverse('web:overall_contributions'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_expired_entry_is_rebuilt_by_one_worker_while_others_serve_it(self):
+        builds = []
+        caching.get_or_build('stampede', lambda: builds.append(1) or 'v1', timeout=-1)
+        # Another worker holds the rebuild lock: the expired value is served as is
+        cache.add('stampede:rebuild', 1)
+        self.assertEqual(caching.get_or_build('stampede', lambda: builds.append(1) or 'v2', timeout=60), 'v1')
+        cache.delete('stampede:rebuild')
+        self.assertEqual(caching.get_or_build('stampede', lambda: builds.append(1) or 'v2', timeout=60), 'v2')
+        self.assertEqual(caching.get_or_build('stampede', lambda: builds.append(1) or 'v3', timeout=60), 'v2')
+        self.assertEqual(len(builds), 2)
+
+
+class ConditionalGetTests(WebTestCase):
+    pages = ('gallery', 'projects', 'activities', 'overall_contributions')
+
+    def test_matching_etag_gets_304_with_at_most_one_query(self):
+        for name in self.pages:
+            with self.subTest(page=name):
+                url = reverse(f'web:{name}')
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                # With the validator evicted it is recomputed by one aggregate
+                groups = resolve(url).func.view_class.cache_groups
+                cache.delete(f'validator:web:{name}:' + ':'.join(caching.get_version(group) for group in groups))
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_activities_answer_if_modified_since(self):
+        Activity.objects.create(
+            title='Tafsir', description='Weekly tafsir', icon='bi-book', frequency='WEEKLY',
+            schedule_details='Every Saturday', time='9:00 AM', location='Main hall',
+        )
+        response = self.client.get(reverse('web:activities'))
+        response = self.client.get(reverse('web:activities'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_contribution_changes_the_statistics_etag(self):
+        url = reverse('web:overall_contributions')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('web:pay_sadaqa'), contribution_data())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_differs_for_logged_in_users(self):
+        url = reverse('web:overall_contributions')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(User.objects.create_user('finance'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ContributionExportTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        self.district = District.objects.create(name='Kampala', date_created=timezone.now())
+        Contribution.objects.create(contribution_type='ZAKAH', district=self.district, **contribution_data(first_name='=SUM(A1)'))
+        Contribution.objects.create(contribution_type='SADAQA', **contribution_data(phone_number='+256700000000'))
+        self.client.force_login(User.objects.create_user('finance'))
+
+    def export(self, **params):
+        response = self.client.get(reverse('web:contribution_export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+
+    def test_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('web:contribution_export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_exports_filtered_rows_in_one_query(self):
+        response = self.client.get(reverse('web:contribution_export'), {'district': self.district.pk})
+        with self.assertNumQueries(1):  # the rows are only read while streaming
+            lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Kampala', lines[1])
+
+    def test_formula_cells_are_escaped_but_phone_numbers_are_not(self):
+        lines = self.export()
+        self.assertIn("'=SUM(A1)", lines[1])
+        self.assertIn(',+256700000000,', lines[2])
+
+    def test_signed_formula_payloads_are_escaped(self):
+        for payload in ("-2+3+cmd|' /C calc'!A0", "+1+cmd|' /C calc'!A0", '-1+HYPERLINK("http://x")'):
+            with self.subTest(payload=payload):
+                self.assertEqual(safe_cell(payload), "'" + payload)
+        Contribution.objects.create(contribution_type='SADAQA', **contribution_data(last_name="-2+3+cmd|' /C calc'!A0"))
+        self.assertIn("'-2+3+cmd|' /C calc'!A0", self.export()[3])
+        self.assertEqual((safe_cell('-1500'), safe_cell('+2.5')), ('-1500', '+2.5'))
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get(reverse('web:contribution_export'), {'date_from': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_action_streams_selected_rows(self):
+        User.objects.filter(username='finance').update(is_staff=True, is_superuser=True)
+        selected = Contribution.objects.filter(contribution_type='SADAQA').values_list('pk', flat=True)
+        response = self.client.post(
+            reverse('admin:web_contribution_changelist'),
+            {'action': 'export_csv', '_selected_action': list(selected)},
+        )
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('SADAQA', lines[1])
+
+    def test_benchmark_reports_rows_per_second_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_export', seed=50, memory=True, stdout=out)
+        self.assertIn('Exported 52 row(s)', out.getvalue())
+        self.assertIn('rows/s, peak memory', out.getvalue())
+        self.assertEqual(Contribution.objects.count(), 2)
+
+
+class ImportContributionsTests(WebTestCase):
+    header = 'contribution_type,first_name,last_name,phone_number,amount,district,project,zakah_type,number_of_people\n'
+
+    def setUp(self):
+        super().setUp()
+        self.district = District.objects.create(name='Kampala', date_created=timezone.now())
+        self.project = Project.objects.create(title='Borehole', description='Water', target_amount=1000)
+
+    def write_csv(self, rows):
+        csv_file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        with csv_file:
+            csv_file.write(self.header + ''.join(row + '\n' for row in rows))
+        self.addCleanup(os.remove, csv_file.name)
+        return csv_file.name
+
+    def run_import(self, rows, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_contributions', self.write_csv(rows), stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_valid_rows_and_updates_totals_per_batch(self):
+        rows = [f'ZAKAH,Amina,Nakato,0700000000,100,kampala,,,' for _ in range(5)]
+        rows += ['PROJECTS,Musa,Ssali,0700000001,300,,Borehole,,', 'ZAKAH,Bad,Amount,0700000002,lots,,,,']
+        out, err = self.run_import(rows, batch_size=2)
+
+        self.assertIn('Imported 6 contribution(s), skipped 1 invalid row(s)', out)
+        self.assertIn('Row 8: amount', err)
+        receipts = sorted(Contribution.objects.filter(contribution_type='ZAKAH').values_list('receipt_number', flat=True))
+        self.assertEqual([int(receipt[9:]) for receipt in receipts], [1, 2, 3, 4, 5])
+        counter = ContributionCounter.objects.total_for('ZAKAH')
+        self.assertEqual((counter.count, counter.total_amount), (5, 500))
+        self.assertCountEqual(
+            ContributionRollup.objects.values_list('district__name', 'count', 'total_amount'),
+            [(None, 1, Decimal('300.00')), ('Kampala', 5, Decimal('500.00'))],
+        )
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.current_amount, 300)
+
+    def test_form_rules_apply(self):
+        _, err = self.run_import([
+            'ZAKAH,Amina,Nakato,0700000000,100,Nowhere,,,',
+            'ZAKAH,Amina,Nakato,0700000000,100,,,FITRI,',
+            'PROJECTS,Amina,Nakato,0700000000,100,,,,',
+        ], dry_run=True)
+        self.assertIn('Unknown district "Nowhere"', err)
+        self.assertIn('Number of people is required', err)
+        self.assertIn('Project contributions need a project', err)
+
+    def test_dry_run_saves_nothing(self):
+        out, _ = self.run_import(['SADAQA,Amina,Nakato,0700000000,100,,,,'], dry_run=True)
+        self.assertIn('Validated 1 contribution(s)', out)
+        self.assertFalse(Contribution.objects.exists())
+        self.assertFalse(ReceiptSequence.objects.exists())
+
+    def test_offset_resumes_after_saved_rows(self):
+        rows = [f'SADAQA,Donor,{index},0700000000,100,,,,' for index in range(4)]
+        self.run_import(rows, offset=3)
+        self.assertEqual(list(Contribution.objects.values_list('last_name', flat=True)), ['3'])
+
+    @override_settings(CONTRIBUTION_COUNTER_SHARDS=1)
+    def test_batch_costs_the_same_queries_whatever_its_size(self):
+        def queries_for(count):
+            path = self.write_csv([f'SADAQA,Donor,{index},0700000000,100,kampala,,,' for index in range(count)])
+            with CaptureQueriesContext(connection) as queries:
+                call_command('import_contributions', path, batch_size=count, stdout=StringIO())
+            # Only the multi-row INSERT is split, by the backend's parameter limit
+            return [
+                re.sub(r'"s\d+_x\d+"', '', query['sql'])[:40]  # savepoint names differ
+                for query in queries if not query['sql'].startswith('INSERT INTO "web_contribution"')
+            ]
+
+        queries_for(1)  # create the sequence, counter and rollup rows
+        self.assertEqual(queries_for(10), queries_for(300))
+
+
+class ContributionFormChoicesTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        self.district = District.objects.create(name='Kampala', date_created=timezone.now())
+        self.project = Project.objects.create(title='Borehole', description='Water', target_amount=1000)
+
+    def choice_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        return response, [
+            query['sql'] for query in queries
+            if 'FROM "web_district"' in query['sql'] or 'FROM "web_project"' in query['sql']
+        ]
+
+    def test_warm_form_renders_and_validates_without_district_or_project_queries(self):
+        self.client.get(reverse('web:pay_projects'))
+
+        response, queries = self.choice_queries(lambda: self.client.get(reverse('web:pay_projects')))
+        self.assertEqual(queries, [])
+        self.assertContains(response, f'<option value="{self.project.pk}">Borehole</option>', html=True)
+        self.assertContains(response, 'Kampala')
+
+        form, queries = self.choice_queries(lambda: ContributionForm(contribution_data(
+            district=self.district.pk, project=self.project.pk,
+        )))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(queries, [])
+        self.assertEqual((form.instance.district_id, form.instance.project_id), (self.district.pk, self.project.pk))
+
+    def test_unknown_choice_is_rejected(self):
+        form = ContributionForm(contribution_data(district=self.district.pk + 100))
+        self.assertFalse(form.is_valid())
+        self.assertIn('district', form.errors)
+
+    def test_choices_follow_district_and_project_changes(self):
+        self.client.get(reverse('web:pay_projects'))
+        with self.captureOnCommitCallbacks(execute=True):
+            District.objects.create(name='Jinja', date_created=timezone.now())
+            Project.objects.filter(pk=self.project.pk).update(is_active=False)
+            Project.objects.create(title='Clinic', description='Health', target_amount=500)
+        response = self.client.get(reverse('web:pay_projects'))
+        self.assertContains(response, 'Jinja')
+        self.assertContains(response, 'Clinic')
+        self.assertNotContains(response, 'Borehole')
+
+    def test_donations_keep_the_project_choices_cached(self):
+        self.client.get(reverse('web:pay_projects'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Contribution.objects.create(contribution_type='PROJECTS', project=self.project, **contribution_data())
+        _, queries = self.choice_queries(lambda: self.client.get(reverse('web:pay_projects')))
+        self.assertEqual(queries, [])
+
+
+class RequestPathQueryTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        # Warm the nisab and form choice caches that every page uses
+        self.client.get(reverse('web:pay_projects'))
+
+    def test_receipt_is_one_joined_query_plus_counter(self):
+        district = District.objects.create(name='Kampala', date_created=timezone.now())
+        project = Project.objects.create(title='Borehole', description='Water', target_amount=1000)
+        contribution = Contribution.objects.create(
+            contribution_type='PROJECTS', district=district, project=project, **contribution_data(),
+        )
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('web:receipt', args=[contribution.pk]))
+        self.assertContains(response, 'Kampala')
+        self.assertContains(response, 'Borehole')
+
+    def test_form_get_only_reads(self):
+        for name in ('pay_zakah', 'pay_sadaqa', 'pay_projects'):
+            with self.subTest(page=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse(f'web:{name}'))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([query['sql'].split()[0] for query in queries], ['SELECT'])
+
+
+class RequestMetricsTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+
+    def test_requests_are_logged_and_exported_per_url_name(self):
+        with self.assertLogs('web.metrics', 'INFO') as logs:
+            self.client.get(reverse('web:gallery'))
+        self.assertRegex(logs.output[0], r'view=web:gallery method=GET status=200 queries=\d+ db_ms=')
+
+        stats = metrics.views['web:gallery']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['template_seconds'], 0)
+
+        with self.settings(METRICS_TOKEN='s3cret'), self.assertNumQueries(0):
+            body = self.client.get(reverse('web:metrics'), HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+        self.assertIn('web_requests_total{view="web:gallery"} 1', body)
+        self.assertIn('web_request_duration_seconds_bucket{view="web:gallery",le="+Inf"} 1', body)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_need_the_token_or_a_staff_login(self):
+        url = reverse('web:metrics')
+        # A loopback address (e.g. behind a local reverse proxy) is not enough
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.client.force_login(User.objects.create_user('finance'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_no_token_configured_means_staff_only(self):
+        response = self.client.get(reverse('web:metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(DEBUG=True)
+    def test_debug_responses_carry_timing_headers(self):
+        self.client.get(reverse('web:pay_zakah'))  # warm the caches
+        response = self.client.get(reverse('web:pay_zakah'))
+        self.assertEqual(response['X-Query-Count'], '1')
+        for header in ('X-DB-Time-Ms', 'X-Template-Time-Ms', 'X-Response-Time-Ms'):
+            self.assertIn(header, response)
+
+    def test_no_headers_outside_debug(self):
+        self.assertNotIn('X-Query-Count', self.client.get(reverse('web:pay_zakah')))
+
+    @override_settings(QUERY_BUDGETS={'web:pay_zakah': 0})
+    def test_exceeding_a_budget_fails_when_enforced(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'over its budget of 0'):
+            self.client.get(reverse('web:pay_zakah'))
+
+        with self.settings(QUERY_BUDGETS_ENFORCE=False), self.assertLogs('web.metrics', 'WARNING'):
+            self.assertEqual(self.client.get(reverse('web:pay_zakah')).status_code, 200)
+
+
+class QueryBudgetTests(WebTestCase):
+    """Each view's worst case: cold caches and a logged-in user (session and user lookups)."""
+
+    def setUp(self):
+        super().setUp()
+        self.district = District.objects.create(name='Kampala', date_created=timezone.now())
+        Project.objects.create(title='Borehole', description='Water', target_amount=1000)
+        Activity.objects.create(
+            title='Tafsir', description='Weekly tafsir', icon='bi-book', frequency='WEEKLY',
+            schedule_details='Every Saturday', time='9:00 AM', location='Main hall',
+        )
+        ZakahNisab.objects.create(amount=Decimal('5000000'))
+        self.contribution = Contribution.objects.create(
+            contribution_type='ZAKAH', district=self.district, **contribution_data(),
+        )
+        self.client.force_login(User.objects.create_user('finance'))
+
+    def assertColdWithinBudget(self, name, args=(), params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'web:{name}', args=args), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), settings.QUERY_BUDGETS[f'web:{name}'])
+
+    def test_home(self):
+        self.assertColdWithinBudget('home')
+
+    def test_receipt(self):
+        self.assertColdWithinBudget('receipt', [self.contribution.pk])
+
+    def test_gallery(self):
+        self.assertColdWithinBudget('gallery')
+
+    def test_projects(self):
+        self.assertColdWithinBudget('projects')
+
+    def test_activities(self):
+        self.assertColdWithinBudget('activities')
+
+    def test_filtered_dashboard(self):
+        params = {'contribution_type': 'ZAKAH', 'district': self.district.pk}
+        self.assertColdWithinBudget('dashboard', params=params)
+
+    def test_contribution_list(self):
+        self.assertColdWithinBudget('contribution_list', ['ZAKAH'])
+
+    def test_overall_contributions(self):
+        self.assertColdWithinBudget('overall_contributions')
+
+    def test_district_contributions(self):
+        self.assertColdWithinBudget('district_contributions', [self.district.pk])
+
+
+class BenchmarkCommandTests(WebTestCase):
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual((benchmark.percentile(values, 50), benchmark.percentile(values, 99)), (50, 99))
+        self.assertEqual(benchmark.percentile([7], 99), 7)
+
+    def test_measure_reports_latency_and_queries(self):
+        command = benchmark.Command()
+        command.random = random.Random(1)
+        command.receipt_ids = [Contribution.objects.create(contribution_type='ZAKAH', **contribution_data()).pk]
+        result = command.measure('receipt', requests=5, warmup=1, threads=1)
+        self.assertEqual((result['requests'], result['errors'], result['max_queries']), (5, 0, 3))
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_cold_mode_bypasses_the_page_cache(self):
+        command = benchmark.Command()
+        warm = command.measure('statistics', requests=3, warmup=1, threads=1)
+        cold = command.measure('statistics', requests=3, warmup=1, threads=1, cold=True)
+        self.assertEqual(warm['max_queries'], 0)
+        # Every cold request runs the page's full set of queries
+        self.assertGreater(cold['max_queries'], 0)
+        self.assertEqual(cold['queries_per_request'], cold['max_queries'])
+
+    def test_mixed_target_writes_and_reads_without_lock_errors(self):
+        command = benchmark.Command()
+        command.random = random.Random(1)
+        command.receipt_ids = [Contribution.objects.create(contribution_type='ZAKAH', **contribution_data()).pk]
+        result = command.measure('mixed', requests=10, warmup=0, threads=1)
+        self.assertEqual((result['errors'], result['lock_errors']), (0, 0))
+        self.assertGreater(Contribution.objects.count(), 1)
+
+
+def photo(name='photo.jpg', size=(2000, 1000), orientation=None):
+    """An uploaded JPEG carrying EXIF (a camera model, optionally a rotation)."""
+    exif = Image.Exif()
+    exif[0x0110] = 'Test Camera'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageVariantTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_upload_gets_metadata_free_variants_and_dimensions(self):
+        item = Gallery.objects.create(title='Iftar', description='Community iftar', image=photo())
+        item.refresh_from_db()
+
+        self.assertEqual((item.image_width, item.image_height), (2000, 1000))
+        variants = item.image_variants['variants']
+        self.assertEqual(
+            [(variant['width'], variant['height'], variant['format']) for variant in variants],
+            [(320, 160, 'webp'), (320, 160, 'jpeg'), (640, 320, 'webp'), (640, 320, 'jpeg'),
+             (1280, 640, 'webp'), (1280, 640, 'jpeg')],
+        )
+        for variant in variants:
+            with item.image.storage.open(variant['name']) as variant_file, Image.open(variant_file) as image:
+                self.assertEqual(image.size, (variant['width'], variant['height']))
+                self.assertEqual(len(image.getexif()), 0)
+
+    def test_rotation_is_applied_and_small_images_are_not_upscaled(self):
+        # Orientation 6: stored landscape, shown rotated a quarter turn
+        item = Gallery.objects.create(title='Tall', description='', image=photo(size=(400, 300), orientation=6))
+        item.refresh_from_db()
+        self.assertEqual((item.image_width, item.image_height), (300, 400))
+        self.assertEqual(sorted({variant['width'] for variant in item.image_variants['variants']}), [300])
+
+    def test_templates_emit_srcset_with_dimensions(self):
+        Gallery.objects.create(title='Iftar', description='', image=photo())
+        Project.objects.create(title='Borehole', description='Water', target_amount=1000, image=photo('borehole.jpg'))
+        for name in ('gallery', 'projects'):
+            with self.subTest(page=name):
+                response = self.client.get(reverse(f'web:{name}'))
+                self.assertContains(response, '<source type="image/webp" srcset="/media/')
+                self.assertContains(response, '-1280w.jpeg 1280w"')
+                self.assertContains(response, 'width="2000" height="1000"')
+
+    def test_replacing_an_image_removes_its_old_variants(self):
+        item = Gallery.objects.create(title='Iftar', description='', image=photo())
+        old = [variant['name'] for variant in item.image_variants['variants']]
+        item.image = photo('second.jpg')
+        item.save()
+        storage = item.image.storage
+        self.assertFalse(any(storage.exists(name) for name in old))
+        self.assertTrue(all(storage.exists(variant['name']) for variant in item.image_variants['variants']))
+
+    def test_backfill_command_processes_images_without_variants(self):
+        item = Gallery.objects.create(title='Iftar', description='', image=photo())
+        Gallery.objects.filter(pk=item.pk).update(image_variants={}, image_width=None)
+        out = StringIO()
+        call_command('generate_image_variants', workers=1, stdout=out)
+        self.assertIn('Made variants for 1 image(s); 0 failed.', out.getvalue())
+        item.refresh_from_db()
+        self.assertEqual(item.image_width, 2000)
+
+
+class GalleryPaginationTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        start = timezone.now()
+        Gallery.objects.bulk_create(
+            Gallery(title=f'Photo {index}', description='word ' * 100, image=f'gallery/{index}.jpg',
+                    date_added=start - timedelta(minutes=index))
+            for index in range(30)
+        )
+
+    def test_pages_follow_the_cursor_newest_first(self):
+        response = self.client.get(reverse('web:gallery'))
+        self.assertEqual([item.title for item in response.context['gallery_items']], [f'Photo {i}' for i in range(12)])
+        self.assertNotContains(response, 'word ' * 30)
+
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(reverse('web:gallery'), {'cursor': cursor})
+        self.assertEqual(response.context['gallery_items'][0].title, 'Photo 12')
+
+    def test_json_feed_has_only_titles_thumbnails_and_cursor(self):
+        titles = []
+        params = {'format': 'json'}
+        while True:
+            data = self.client.get(reverse('web:gallery'), params).json()
+            titles += [item['title'] for item in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(titles, [f'Photo {i}' for i in range(30)])
+        self.assertEqual(data['results'][0], {
+            'title': 'Photo 24', 'thumbnail': {'url': '/media/gallery/24.jpg', 'width': None, 'height': None},
+        })
+
+    def test_thumbnail_prefers_the_640px_copy(self):
+        item = Gallery(image='gallery/a.jpg', image_width=2000, image_height=1000, image_variants={'variants': [
+            {'width': width, 'height': width // 2, 'format': extension, 'name': f'gallery/variants/a-{width}w.{extension}'}
+            for width in (320, 640, 1280) for extension in ('webp', 'jpeg')
+        ]})
+        self.assertEqual(item.thumbnail(), {'url': '/media/gallery/variants/a-640w.jpeg', 'width': 640, 'height': 320})
+
+    @skipUnless(connection.vendor == 'sqlite', 'Checks the SQLite query plan')
+    def test_page_query_uses_the_date_index(self):
+        queryset = Gallery.objects.order_by('-date_added', '-id')[:13]
+        with connection.cursor() as cursor:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('gallery_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class StaticPipelineTests(WebTestCase):
+    def setUp(self):
+        super().setUp()
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        self.enterContext(override_settings(STATIC_ROOT=static_root))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.static_root = static_root
+
+    def serve(self, path, **headers):
+        def start_response(status, response_headers):
+            response.update(status=status, headers=dict(response_headers))
+
+        response = {}
+        environ = {'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, **headers}
+        body = b''.join(CompressedStaticFiles(lambda environ, start_response: [b'django'])(environ, start_response))
+        return response, body
+
+    def test_collectstatic_minifies_hashes_and_compresses(self):
+        hashed = staticfiles_storage.hashed_files['css/home.css']
+        self.assertRegex(hashed, r'^css/home\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.static_root, hashed), 'rb') as css_file:
+            css = css_file.read()
+        self.assertNotIn(b'\n', css)
+        self.assertTrue(css.startswith(b'.hero-section{margin:-2rem -1rem 2rem -1rem;'))
+        with open(os.path.join(self.static_root, hashed + '.gz'), 'rb') as gz_file:
+            self.assertEqual(gzip.decompress(gz_file.read()), css)
+        # Images are left uncompressed; the admin's files are not minified
+        self.assertFalse(os.path.exists(os.path.join(self.static_root, 'about.png.gz')))
+        with open(os.path.join(self.static_root, 'admin/css/base.css'), 'rb') as admin_css:
+            self.assertIn(b'\n', admin_css.read())
+
+    def test_collectstatic_leaves_js_as_written(self):
+        hashed = staticfiles_storage.hashed_files['js/home.js']
+        with open(os.path.join(self.static_root, hashed), 'rb') as served, open(finders.find('js/home.js'), 'rb') as source:
+            self.assertEqual(served.read(), source.read())
+
+    def test_wsgi_serves_hashed_files_compressed_with_far_future_caching(self):
+        hashed = staticfiles_storage.hashed_files['js/home.js']
+        response, body = self.serve(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate, br;q=0')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(response['headers']['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn(b'animateCounter', gzip.decompress(body))
+
+        response, body = self.serve(
+            f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['headers']['ETag'],
+        )
+        self.assertEqual((response['status'], body), ('304 Not Modified', b''))
+
+        response, body = self.serve('/static/js/home.js')
+        self.assertNotIn('Content-Encoding', response['headers'])
+        self.assertEqual(response['headers']['Cache-Control'], 'public, max-age=60')
+
+        for path in ('/static/../manage.py', '/static/js/home.js.gz', '/static/missing.css'):
+            with self.subTest(path=path):
+                self.assertEqual(self.serve(path)[1], b'django')
+
+    def test_pages_link_the_bundles_instead_of_inline_blocks(self):
+        response = self.client.get(reverse('web:home'))
+        css, js = staticfiles_storage.url('css/home.css'), staticfiles_storage.url('js/home.js')
+        self.assertIn(staticfiles_storage.hashed_files['css/home.css'], css)
+        self.assertContains(response, f'<link rel="stylesheet" href="{css}">', html=True)
+        self.assertContains(response, f'<script src="{js}"></script>', html=True)
+        self.assertNotContains(response, '<style>')
+
+    def test_minify_css_keeps_significant_spaces(self):
+        css = '/* nav */\n.navbar a :hover ,\n.x {\n  width: calc(100% - 2rem);\n  margin: 0 auto;\n}\n'
+        self.assertEqual(minify_css(css), '.navbar a :hover,.x{width:calc(100% - 2rem);margin:0 auto}')
+
+    def test_minify_css_leaves_strings_and_urls_alone(self):
+        css = (
+            '.a::before {\n  content: "  a  ;  b  /* c */";\n}\n'
+            ".b { background: url( /img/x,  y.png ); font-family: 'Open  Sans' }\n"
+            "/* it's a comment */ .c { content: '\\'' }"
+        )
+        self.assertEqual(minify_css(css), (
+            '.a::before{content:"  a  ;  b  /* c */"}'
+            ".b{background:url( /img/x,  y.png );font-family:'Open  Sans'}"
+            ".c{content:'\\''}"
+        ))
+
+
+class ContributionConcurrencyTests(TransactionTestCase):
+    submissions = 200
+    workers = 16
+
+    def submit(self, index):
+        try:
+            response = Client().post(reverse('web:pay_zakah'), contribution_data(phone_number=f'07{index:08d}'))
+            return response.status_code
+        finally:
+            connections.close_all()
+
+    def test_concurrent_submissions_get_unique_gapless_receipts(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            statuses = list(pool.map(self.submit, range(self.submissions)))
+
+        self.assertEqual(statuses, [302] * self.submissions)
+        receipts = sorted(Contribution.objects.values_list('receipt_number', flat=True))
+        self.assertEqual(len(set(receipts)), self.submissions)
+        self.assertEqual([int(receipt[9:]) for receipt in receipts], list(range(1, self.submissions + 1)))
+        counter = ContributionCounter.objects.total_for('ZAKAH')
+        self.assertEqual((counter.count, counter.total_amount), (self.submissions, 10000 * self.submissions))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection settings')
+class SQLiteConnectionTests(TransactionTestCase):
+    def test_new_connections_run_the_init_pragmas(self):
+        with connection.cursor() as cursor:
+            values = []
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values.append(cursor.fetchone()[0])
+        # synchronous=NORMAL is 1
+        self.assertEqual(values, ['wal', 1, 5000, -20000])
+
+    def test_write_transactions_begin_immediate(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            District.objects.create(name='Kampala', date_created=timezone.now())
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_unknown_transaction_mode_is_rejected(self):
+        wrapper = type(connections['default'])({**connection.settings_dict, 'OPTIONS': {'transaction_mode': 'LATER'}})
+        with self.assertRaisesMessage(ImproperlyConfigured, 'must be one of DEFERRED, IMMEDIATE, EXCLUSIVE'):
+            wrapper.get_connection_params()
+
+
+@override_settings(READ_REPLICA='replica')
+class ReadReplicaRoutingTests(TransactionTestCase):
+    # 'replica' is a read-only connection to the test database (TEST MIRROR)
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('finance'))
+        self.contribution = Contribution.objects.create(contribution_type='ZAKAH', **contribution_data())
+
+    def queries(self, path):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(path)
+            if response.streaming:
+                content = b''.join(response.streaming_content)
+            else:
+                content = response.content
+        self.assertEqual(response.status_code, 200)
+        return content, [query['sql'] for query in primary], [query['sql'] for query in replica]
+
+    def test_report_views_read_web_tables_from_the_replica(self):
+        for name, args in (
+            ('overall_contributions', []), ('dashboard', []), ('contribution_export', []),
+            ('contribution_list', ['ZAKAH']),
+        ):
+            with self.subTest(view=name):
+                content, primary, replica = self.queries(reverse(f'web:{name}', args=args))
+                self.assertTrue(replica)
+                self.assertFalse([sql for sql in primary if '"web_' in sql])
+                if name == 'contribution_export':
+                    # Its rows are read while streaming, still from the replica
+                    self.assertIn(self.contribution.receipt_number.encode(), content)
+
+    def test_donations_and_other_pages_stay_on_the_primary(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.post(reverse('web:pay_zakah'), contribution_data())
+            self.client.get(response.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(replica), 0)
+
+    def test_replica_refuses_writes(self):
+        with self.assertRaisesMessage(OperationalError, 'readonly'):
+            District.objects.using('replica').create(name='Kampala', date_created=timezone.now())
+
+    def test_instances_read_from_the_replica_save_to_the_primary(self):
+        contribution = Contribution.objects.using('replica').get(pk=self.contribution.pk)
+        contribution.first_name = 'Halima'
+        contribution.save()
+        self.assertEqual(Contribution.objects.get(pk=contribution.pk).first_name, 'Halima')
@@ -12,7 +12,10 @@ urlpatterns = [
     path('receipt/<int:contribution_id>/', views.ReceiptView.as_view(), name='receipt'),
     path('gallery/', views.GalleryView.as_view(), name='gallery'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('dashboard/export/', views.ContributionExportView.as_view(), name='contribution_export'),
     path('statistics/', views.OverallContributionsView.as_view(), name='overall_contributions'),
+    path('statistics/districts/<int:district_id>/', views.DistrictContributionsView.as_view(), name='district_contributions'),
     path('projects/', views.ProjectListView.as_view(), name='projects'),
     path('activities/', views.ActivityListView.as_view(), name='activities'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ] 
\ No newline at end of file
@@ -1,23 +1,37 @@
+import json
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.generic import ListView, DetailView, CreateView, TemplateView
+from django.views.generic import ListView, DetailView, CreateView, TemplateView, View
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
 from django.contrib import messages
-from .models import Contribution, Gallery, ContributionCounter, Activity, Project
-from .forms import ContributionForm
+from .models import Contribution, Gallery, ContributionCounter, ContributionRollup, Activity, Project, ZakahNisabPeriod
+from .forms import ContributionForm, DashboardFilterForm
+from .caching import CachedPageMixin, ConditionalGetMixin
+from .exports import contributions_csv_response
+from .instrumentation import metrics
+from .pagination import KeysetPaginationMixin
+from .routers import ReadReplicaMixin
+from . import statistics
 from django.utils import timezone
-import calendar
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
 from .models import District
 
 # Create your views here.
 
-class HomeView(TemplateView):
+class HomeView(CachedPageMixin, TemplateView):
     template_name = 'web/home.html'
+    cache_groups = ('contributions', 'nisab')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['counters'] = ContributionCounter.objects.all()
+        # Passed uncalled so the query only runs when the counters fragment isn't cached
+        context['counters'] = ContributionCounter.objects.totals
         return context
 
 class ContributionCreateView(CreateView):
@@ -32,45 +46,19 @@ class ContributionCreateView(CreateView):
         context['contribution_type'] = contribution_type
         
         # Get contribution counter for the selected type
-        counter, _ = ContributionCounter.objects.get_or_create(contribution_type=contribution_type)
-        context['counter'] = counter
-
-        # If this is a project contribution, get active projects
-        if contribution_type == 'PROJECTS':
-            context['active_projects'] = Project.objects.filter(is_active=True)
-        
+        context['counter'] = ContributionCounter.objects.total_for(contribution_type)
         return context
 
     def form_valid(self, form):
         # Set the contribution type from URL parameter
         form.instance.contribution_type = self.kwargs.get('contribution_type', 'ZAKAH')
         
-        # Generate receipt number
-        if not form.instance.receipt_number:
-            prefix = form.instance.contribution_type[:3].upper()
-            date_str = timezone.now().strftime('%y%m%d')
-            last_receipt = Contribution.objects.filter(
-                receipt_number__startswith=f'{prefix}{date_str}'
-            ).order_by('-receipt_number').first()
-            
-            if last_receipt:
-                last_num = int(last_receipt.receipt_number[-4:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-                
-            form.instance.receipt_number = f'{prefix}{date_str}{new_num:04d}'
-        
-        # Save the form and get the created contribution
-        self.object = form.save()
-        
-        # Update contribution counter
-        counter, _ = ContributionCounter.objects.get_or_create(
-            contribution_type=form.instance.contribution_type
-        )
-        counter.count += 1
-        counter.total_amount += form.instance.amount
-        counter.save()
+        with transaction.atomic():
+            # Save the form and get the created contribution (Contribution.save allocates the receipt number)
+            self.object = form.save()
+
+            # Update contribution counter
+            ContributionCounter.objects.increment(self.object.contribution_type, self.object.amount)
         
         # Redirect to the receipt page with the new contribution's ID
         return redirect('web:receipt', contribution_id=self.object.id)
@@ -86,137 +74,194 @@ class ReceiptView(DetailView):
     context_object_name = 'contribution'
 
     def get_object(self):
-        return get_object_or_404(Contribution, id=self.kwargs['contribution_id'])
+        contributions = Contribution.objects.select_related('district', 'project')
+        return get_object_or_404(contributions, id=self.kwargs['contribution_id'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        contribution = self.get_object()
-        try:
-            context['counter'] = ContributionCounter.objects.get(contribution_type=contribution.contribution_type)
-        except ContributionCounter.DoesNotExist:
-            context['counter'] = None
+        # DetailView.get() has already loaded self.object
+        context['counter'] = ContributionCounter.objects.total_for(self.object.contribution_type)
+        if self.object.contribution_type == 'ZAKAH':
+            # The nisab the payment was made against, not whatever is active today
+            context['nisab'] = ZakahNisabPeriod.objects.effective_at(self.object.date_contributed)
         return context
 
-class GalleryView(ListView):
+class GalleryView(ConditionalGetMixin, CachedPageMixin, KeysetPaginationMixin, ListView):
     model = Gallery
+    cache_groups = ('gallery',)
+    cache_query_params = ('cursor', 'format')
     template_name = 'web/gallery.html'
     context_object_name = 'gallery_items'
-    ordering = ['-date_added']
+    paginate_by = 12
+    keyset_field = 'date_added'
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') != 'json':
+            return super().render_to_response(context, **response_kwargs)
+        # Just enough for the page to append cards as the visitor scrolls
+        page = context['page_obj']
+        return JsonResponse({
+            'results': [{'title': item.title, 'thumbnail': item.thumbnail()} for item in page],
+            'next_cursor': page.next_cursor,
+        })
 
-class DashboardView(LoginRequiredMixin, ListView):
+    def get_validator_data(self):
+        # date_added doesn't move when an item is edited, so no Last-Modified; the
+        # gallery cache version in the ETag covers edits
+        return tuple(Gallery.objects.aggregate(latest=Max('date_added'), count=Count('id')).values()), None
+
+class DashboardView(ReadReplicaMixin, LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Contribution
     template_name = 'web/dashboard.html'
     context_object_name = 'contributions'
-    ordering = ['-date_contributed']
+    paginate_by = 50
+    keyset_field = 'date_contributed'
+
+    def get_queryset(self):
+        self.filter_form = DashboardFilterForm(self.request.GET or None)
+        contributions = Contribution.objects.only(
+            'receipt_number', 'first_name', 'last_name', 'contribution_type', 'amount', 'date_contributed'
+        )
+        return self.filter_form.filter(contributions)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_contributions'] = Contribution.objects.count()
-        context['total_amount'] = Contribution.objects.aggregate(total=Sum('amount'))['total']
-        context['counters'] = ContributionCounter.objects.all()
+        context['filter_form'] = self.filter_form
+        context['total_contributions'], context['total_amount'] = statistics.contribution_totals()
+        context['counters'] = ContributionCounter.objects.totals()
         return context
 
-class ContributionListView(ListView):
+class ContributionExportView(ReadReplicaMixin, LoginRequiredMixin, View):
+    """CSV of the contributions matching the dashboard filters, streamed so memory stays flat."""
+
+    def get(self, request):
+        filter_form = DashboardFilterForm(request.GET or None)
+        if filter_form.is_bound and not filter_form.is_valid():
+            return HttpResponseBadRequest('Invalid filters: ' + filter_form.errors.as_text())
+        filename = f'contributions-{timezone.localdate():%Y%m%d}.csv'
+        contributions = filter_form.filter(Contribution.objects.all())
+        # The rows are read while streaming, after dispatch has returned; pin
+        # the alias the router picks now
+        return contributions_csv_response(contributions.using(contributions.db), filename)
+
+class MetricsView(View):
+    """Request metrics of this worker process in the Prometheus text format."""
+
+    def get(self, request):
+        if not (self.has_token(request) or request.user.is_staff):
+            return HttpResponseForbidden()
+        return HttpResponse(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    def has_token(self, request):
+        # Behind a local reverse proxy every client's address is loopback, so
+        # scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>"
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        return bool(settings.METRICS_TOKEN) and scheme.lower() == 'bearer' and constant_time_compare(
+            token, settings.METRICS_TOKEN,
+        )
+
+class ContributionListView(ReadReplicaMixin, KeysetPaginationMixin, ListView):
     model = Contribution
     template_name = 'web/contribution_list.html'
     context_object_name = 'contributions'
+    paginate_by = 25
+    keyset_field = 'date_contributed'
+
+    @property
+    def wants_json(self):
+        return self.request.GET.get('format') == 'json'
 
     def get_queryset(self):
         contribution_type = self.kwargs.get('contribution_type')
-        return Contribution.objects.filter(contribution_type=contribution_type)
+        # Served by the (contribution_type, date_contributed, id) index
+        return (
+            Contribution.objects.filter(contribution_type=contribution_type)
+            .select_related('district')
+            # Public page: no donor names or other personal details
+            .only('amount', 'date_contributed', 'district__name')
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        if self.wants_json:
+            return context
         contribution_type = self.kwargs.get('contribution_type')
         context['contribution_type'] = contribution_type
-        
-        # Get or create the counter
-        counter, created = ContributionCounter.objects.get_or_create(
-            contribution_type=contribution_type,
-            defaults={
-                'count': 0,
-                'total_amount': 0
+        context['counter'] = ContributionCounter.objects.total_for(contribution_type)
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.wants_json:
+            return StreamingHttpResponse(self.stream_json(context['page_obj']), content_type='application/json')
+        return super().render_to_response(context, **response_kwargs)
+
+    def stream_json(self, page):
+        # Write the page row by row so the front-end can append it for infinite scroll
+        yield '{"results": ['
+        for index, contribution in enumerate(page):
+            row = {
+                'amount': str(contribution.amount),
+                'district': contribution.district.name if contribution.district else None,
+                'date_contributed': timezone.localdate(contribution.date_contributed).isoformat(),
             }
+            yield (',' if index else '') + json.dumps(row)
+        yield '], "next_cursor": %s}' % json.dumps(page.next_cursor)
+
+class OverallContributionsView(ReadReplicaMixin, ConditionalGetMixin, CachedPageMixin, TemplateView):
+    template_name = 'web/overall_contributions.html'
+    cache_groups = ('contributions',)
+
+    def get_validator_data(self):
+        totals = ContributionRollup.objects.aggregate(
+            latest=Max('date'), count=Sum('count'), amount=Sum('total_amount')
         )
-        context['counter'] = counter
-        
+        return (timezone.now().year, *totals.values()), None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        year = timezone.now().year
+        context['current_year'] = year
+        # Lazy so the aggregates only run when the statistics fragment isn't cached
+        context['stats'] = SimpleLazyObject(lambda: statistics.overall_statistics(year))
         return context
 
-class OverallContributionsView(TemplateView):
-    template_name = 'web/overall_contributions.html'
+class DistrictContributionsView(ReadReplicaMixin, LoginRequiredMixin, ListView):
+    template_name = 'web/district_contributions.html'
+    context_object_name = 'contributions'
+    paginate_by = 25
+
+    def get_queryset(self):
+        self.district = get_object_or_404(District, id=self.kwargs['district_id'])
+        return (
+            Contribution.objects.filter(district=self.district)
+            .order_by('-date_contributed', '-id')
+            .only('receipt_number', 'first_name', 'last_name', 'contribution_type', 'amount', 'date_contributed')
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        # Get total contributions and amount
-        total_contributions = Contribution.objects.count()
-        total_amount = Contribution.objects.aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Get contribution type breakdown
-        type_breakdown = []
-        for type_code, type_name in Contribution.CONTRIBUTION_TYPES:
-            contributions = Contribution.objects.filter(contribution_type=type_code)
-            count = contributions.count()
-            amount = contributions.aggregate(total=Sum('amount'))['total'] or 0
-            percentage = (amount / total_amount * 100) if total_amount > 0 else 0
-            type_breakdown.append({
-                'type': type_name,
-                'count': count,
-                'amount': amount,
-                'percentage': round(percentage, 1)
-            })
-        
-        # Get monthly breakdown
-        monthly_data = []
-        current_year = timezone.now().year
-        for month in range(1, 13):
-            contributions = Contribution.objects.filter(
-                date_contributed__year=current_year,
-                date_contributed__month=month
-            )
-            amount = contributions.aggregate(total=Sum('amount'))['total'] or 0
-            monthly_data.append({
-                'month': calendar.month_abbr[month],
-                'amount': amount
-            })
-        
-        context.update({
-            'total_contributions': total_contributions,
-            'total_amount': total_amount,
-            'type_breakdown': type_breakdown,
-            'monthly_data': monthly_data,
-            'current_year': current_year
-        })
-  
-        # Get all districts under all contributions, and then make total for each
-        districts_with_contributions = []
-
-        for district in District.objects.all():
-            contributions = Contribution.objects.filter(district=district)
-            total = contributions.aggregate(total_amount=Sum('amount'))['total_amount'] or 0
-
-            districts_with_contributions.append({
-                'district': district,
-                'total_amount': total,
-                'contributors_count': len(contributions), 
-                'contributions': contributions,
-            })
-
-        context['district_data'] = districts_with_contributions
-        
+        context['district'] = self.district
         return context
 
 class OngoingProjectsView(TemplateView):
     template_name = 'web/ongoing_projects.html'
 
-class ActivityListView(ListView):
+class ActivityListView(ConditionalGetMixin, CachedPageMixin, ListView):
     model = Activity
+    cache_groups = ('activities',)
     template_name = 'web/activities.html'
     context_object_name = 'activities'
 
     def get_queryset(self):
         return Activity.objects.filter(is_active=True)
 
+    def get_validator_data(self):
+        # Deactivating touches updated_at too, so take it over all activities
+        totals = Activity.objects.aggregate(
+            latest=Max('updated_at'), active=Count('id', filter=Q(is_active=True))
+        )
+        return tuple(totals.values()), totals['latest']
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Group activities by frequency
@@ -231,14 +276,22 @@ class ActivityListView(ListView):
         context['grouped_activities'] = grouped_activities
         return context
 
-class ProjectListView(ListView):
+class ProjectListView(ConditionalGetMixin, CachedPageMixin, ListView):
     model = Project
+    cache_groups = ('projects',)
     template_name = 'web/projects.html'
     context_object_name = 'projects'
     ordering = ['-created_at']
 
     def get_queryset(self):
-        return Project.objects.filter(is_active=True)
+        return Project.objects.filter(is_active=True).with_stats()
+
+    def get_validator_data(self):
+        # Donations move current_amount without touching updated_at, so no Last-Modified
+        totals = Project.objects.filter(is_active=True).aggregate(
+            latest=Max('updated_at'), count=Count('id'), raised=Sum('current_amount')
+        )
+        return tuple(totals.values()), None
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)